@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import zipfile
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ScreeningTask
+from resume_extraction import file_extension
+from task_queue import task_queue, serialize_task
+
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+# Whole multipart body of one batch upload (all files and archives), enforced as it arrives
+BATCH_MAX_REQUEST_BYTES = int(os.getenv("BATCH_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+
+SUPPORTED_EXTENSIONS = {"pdf", "docx"}
+
+
+class BatchError(Exception):
+    # Invalid batch upload (bad archive, too many files, unsupported type)
+    pass
+
+
+def spool_uploads(uploads):
+    # Runs in a thread: streams plain uploads and ZIP members to the task spool dir.
+    # Returns a list of (task_id, filename, path).
+    spooled = []
+
+    def add(filename, src):
+        if len(spooled) >= BATCH_MAX_FILES:
+            raise BatchError(f"A batch can contain at most {BATCH_MAX_FILES} resumes")
+        task_id = task_queue.new_task_id()
+        spooled.append((task_id, filename, task_queue.spool(task_id, filename, src)))
+
+    try:
+        for filename, fileobj in uploads:
+            ext = file_extension(filename)
+            if ext == "zip":
+                try:
+                    archive = zipfile.ZipFile(fileobj)
+                except zipfile.BadZipFile:
+                    raise BatchError(f"{filename} is not a valid ZIP archive")
+                with archive:
+                    for info in archive.infolist():
+                        name = os.path.basename(info.filename)
+                        if info.is_dir() or not name or file_extension(name) not in SUPPORTED_EXTENSIONS:
+                            continue
+                        if info.file_size > BATCH_MAX_FILE_BYTES:
+                            raise BatchError(f"{name} in {filename} exceeds {BATCH_MAX_FILE_BYTES} bytes")
+                        with archive.open(info) as src:
+                            add(name, src)
+            elif ext in SUPPORTED_EXTENSIONS:
+                fileobj.seek(0, os.SEEK_END)
+                if fileobj.tell() > BATCH_MAX_FILE_BYTES:
+                    raise BatchError(f"{filename} exceeds {BATCH_MAX_FILE_BYTES} bytes")
+                fileobj.seek(0)
+                add(filename, fileobj)
+            else:
+                raise BatchError(f"Unsupported file type: {filename}")
+    except BaseException:
+        remove_spooled(spooled)
+        raise
+
+    if not spooled:
+        raise BatchError("No PDF or DOCX resumes found in the upload")
+    return spooled
+
+
+def remove_spooled(spooled):
+    for _, _, path in spooled:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def submit_batch(db: AsyncSession, job_id, uploads):
+    # `uploads` is a list of (filename, file object) pairs; every resume becomes one durable "screen" task
+    batch_id = task_queue.new_task_id()
+    spooled = await asyncio.to_thread(spool_uploads, uploads)
+    specs = [
+        (task_id, "screen", {"job_id": job_id, "filename": filename, "index": index}, path)
+        for index, (task_id, filename, path) in enumerate(spooled)
+    ]
+    try:
+        await task_queue.enqueue_many(db, specs, batch_id=batch_id)
+    except Exception:
+        remove_spooled(spooled)
+        raise
+    return batch_id, len(specs)
+
+
+async def get_batch(db: AsyncSession, batch_id):
+    result = await db.execute(
+        select(ScreeningTask).where(ScreeningTask.batch_id == batch_id).order_by(ScreeningTask.created_at, ScreeningTask.id)
+    )
+    tasks = result.scalars().all()
+    if not tasks:
+        return None
+
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    files = []
+    for task in tasks:
+        counts[task.status] += 1
+        payload = json.loads(task.payload)
+        files.append({"index": payload.get("index"), "filename": payload.get("filename"), **serialize_task(task)})
+    files.sort(key=lambda f: f["index"] or 0)
+
+    if counts["pending"] + counts["running"] == 0:
+        status = "completed"
+    elif counts["pending"] == len(tasks):
+        status = "queued"
+    else:
+        status = "running"
+
+    return {
+        "batch_id": batch_id,
+        "job_id": json.loads(tasks[0].payload).get("job_id"),
+        "status": status,
+        "total": len(tasks),
+        **counts,
+        "files": files
+    }
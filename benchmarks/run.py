@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stub_llm import install_stub
+from benchmarks.synthetic import make_resume
+
+
+SCENARIOS = ("jobs", "screen", "analyze", "admin_logs")
+BENCH_ADMIN = "bench-admin"
+JOB_TITLES = ["Backend Developer", "Data Scientist", "Frontend Developer", "DevOps Engineer", "ML Engineer"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark against a fresh SQLite database")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated in-flight request levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="+/- fraction applied to the stub latency")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--resume-words", type=int, default=400)
+    parser.add_argument("--resume-format", choices=("mix", "pdf", "docx"), default="mix")
+    parser.add_argument("--analyze-titles", type=int, default=3, help="job titles per /analyze_resume request")
+    parser.add_argument("--analyze-mode", choices=("parallel", "batch"), default="parallel")
+    parser.add_argument("--seed-logs", type=int, default=2000, help="ResumeLog rows inserted before admin_logs runs")
+    parser.add_argument("--logs-limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="where the database and stored files go (default: a temp dir)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir):
+    # Must run before any app module is imported: they read their settings at import time
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.chdir(workdir)  # resume store, task spool and upload dirs are relative paths
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(durations):
+    values = sorted(durations)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux; children covers parsing worker processes that have exited
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": round(self_kb / 1024, 1), "children": round(children_kb / 1024, 1)}
+
+
+class StageTimer:
+    # Wraps pipeline steps in place and records how long each call took
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    def wrap(self, owner, attr, stage):
+        original = getattr(owner, attr)
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.durations[stage].append(time.perf_counter() - started)
+
+        setattr(owner, attr, timed)
+
+    def reset(self):
+        self.durations.clear()
+
+    def report(self):
+        return {stage: summarize(values) for stage, values in sorted(self.durations.items())}
+
+
+def instrument(timer, stub):
+    import resume_screening_core
+    import screening
+    from blob_store import resume_store
+    from job_artifacts import job_artifacts
+    from resume_extraction import extraction_service
+    from write_buffer import result_write_buffer
+
+    timer.wrap(resume_store, "save_stream", "store_upload")
+    timer.wrap(extraction_service, "_extract_async", "extract")
+    timer.wrap(job_artifacts, "get", "job_artifacts")
+    timer.wrap(screening, "analyze_resume", "analyze")
+    timer.wrap(resume_screening_core, "get_gemini_score", "llm_score")
+    timer.wrap(result_write_buffer, "write", "db_write")
+    timer.wrap(stub, "generate_content_async", "llm_call")
+
+
+async def seed_database(client, args):
+    from crud import upsert_resume_logs
+    from database import async_session
+
+    for index, title in enumerate(JOB_TITLES):
+        response = await client.post("/jobs", json={
+            "title": title,
+            "description": f"{title} working with Python, SQL, FastAPI, Docker and cloud services.",
+            "department": "Engineering",
+            "location": "Remote",
+            "deadline": "2099-01-01T00:00:00",
+            "required_skills": "Python, SQL, FastAPI, Docker",
+            "company_name": "Bench Corp",
+            "created_by": BENCH_ADMIN,
+        })
+        response.raise_for_status()
+
+    if args.seed_logs:
+        rng = random.Random(args.seed)
+        now = datetime.datetime.utcnow()
+        rows = [
+            {
+                "name": f"Seeded {i}",
+                "email": f"seed{i}@bench.example",
+                "role": JOB_TITLES[i % len(JOB_TITLES)],
+                "experience_level": rng.choice(["junior", "mid", "senior"]),
+                "final_score": round(rng.random(), 2),
+                "score_source": "llm",
+                "status": rng.choice(["ACCEPTED", "REJECTED"]),
+                "timestamp": now - datetime.timedelta(seconds=i),
+                "job_id": i % len(JOB_TITLES) + 1,
+            }
+            for i in range(args.seed_logs)
+        ]
+        async with async_session() as db:
+            for start in range(0, len(rows), 500):
+                await upsert_resume_logs(db, rows[start:start + 500])
+            await db.commit()
+
+
+def build_requests(scenario, args, count, offset):
+    # Pre-built so resume generation is not part of the measured time
+    if scenario == "jobs":
+        return [("GET", "/jobs", {}) for _ in range(count)]
+    if scenario == "admin_logs":
+        return [("GET", "/admin/logs", {"params": {"created_by": BENCH_ADMIN, "limit": args.logs_limit}}) for _ in range(count)]
+
+    requests = []
+    for i in range(count):
+        index = offset + i
+        filename, content = make_resume(index, args.resume_format, args.resume_words, args.seed)
+        files = {"file": (filename, content, "application/octet-stream")}
+        if scenario == "screen":
+            data = {"job_id": str(index % len(JOB_TITLES) + 1)}
+            requests.append(("POST", "/screen", {"data": data, "files": files}))
+        else:
+            titles = [JOB_TITLES[(index + k) % len(JOB_TITLES)] for k in range(args.analyze_titles)]
+            data = {
+                "titles": json.dumps(titles),
+                "descriptions": json.dumps([f"{t} with Python, SQL and Docker." for t in titles]),
+                "mode": args.analyze_mode,
+            }
+            requests.append(("POST", "/analyze_resume", {"data": data, "files": files}))
+    return requests
+
+
+async def run_level(client, requests, concurrency):
+    latencies, statuses = [], defaultdict(int)
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        while True:
+            try:
+                method, url, kwargs = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[e.__class__.__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(n for status, n in statuses.items() if not (status.isdigit() and int(status) < 400))
+    return {
+        **summarize(latencies),
+        "errors": errors,
+        "statuses": dict(statuses),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def run(args):
+    import httpx
+    import database
+    import main
+
+    database.engine.echo = False
+    stub = install_stub(args.llm_latency_ms, args.llm_jitter, args.llm_failure_rate, args.seed)
+    timer = StageTimer()
+    instrument(timer, stub)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    report = {"scenarios": {}}
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await seed_database(client, args)
+            offset = 0
+            for scenario in scenarios:
+                results = {}
+                for level in levels:
+                    requests = build_requests(scenario, args, args.requests, offset)
+                    offset += args.requests
+                    timer.reset()
+                    result = await run_level(client, requests, level)
+                    result["stages"] = timer.report()
+                    result["peak_rss_mb"] = peak_rss_mb()
+                    results[str(level)] = result
+                    print(
+                        f"⏱️ {scenario:<10} c={level:<3} {result['requests_per_s']:>8} req/s  "
+                        f"p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  "
+                        f"errors {result['errors']}",
+                        file=sys.stderr
+                    )
+                report["scenarios"][scenario] = results
+    finally:
+        await main.app.router.shutdown()
+
+    report["llm_stub"] = stub.stats()
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    # Percent change per scenario/level for the headline numbers (negative latency change = faster)
+    lines = []
+    for scenario, levels in report["scenarios"].items():
+        for level, result in levels.items():
+            base = baseline.get("scenarios", {}).get(scenario, {}).get(level)
+            if not base:
+                continue
+            cells = []
+            for key in ("requests_per_s", "p50_ms", "p95_ms", "p99_ms"):
+                if base.get(key):
+                    change = (result[key] - base[key]) / base[key] * 100
+                    cells.append(f"{key} {base[key]} -> {result[key]} ({change:+.1f}%)")
+            lines.append(f"{scenario} c={level}: " + ", ".join(cells))
+    return lines
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="resume-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    configure_environment(args, workdir)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workdir": workdir,
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")},
+        },
+    }
+    # The app prints as it works; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report.update(asyncio.run(run(args)))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    if baseline_path:
+        with open(baseline_path) as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
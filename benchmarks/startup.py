@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run import git_commit
+from benchmarks.synthetic import make_resume
+
+# Phases measured by each cold process, in the order they happen
+PHASES = ("import_s", "startup_s", "first_jobs_s", "first_screen_s", "second_screen_s", "ready_s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start benchmark: import, app startup and first request latency")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreter processes to measure")
+    parser.add_argument("--importtime-top", type=int, default=15, help="slowest imports to list from python -X importtime (0 = skip)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)  # workdir of a single measured run
+    return parser.parse_args(argv)
+
+
+def child_environment(workdir):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'startup.db')}"
+    env.setdefault("GEMINI_API_KEY", "offline")
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+async def measure_requests(main, timings, started):
+    import httpx
+
+    startup_started = time.perf_counter()
+    await main.app.router.startup()
+    timings["startup_s"] = time.perf_counter() - startup_started
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup", timeout=None) as client:
+            response = await client.post("/jobs", json={
+                "title": "Backend Developer",
+                "description": "Backend Developer working with Python, SQL, FastAPI and Docker.",
+                "department": "Engineering",
+                "location": "Remote",
+                "deadline": "2099-01-01T00:00:00",
+                "required_skills": "Python, SQL, FastAPI, Docker",
+                "company_name": "Bench Corp",
+                "created_by": "startup-bench",
+            })
+            response.raise_for_status()
+            job_id = 1  # fresh database; POST /jobs does not return the id
+
+            request_started = time.perf_counter()
+            (await client.get("/jobs")).raise_for_status()
+            timings["first_jobs_s"] = time.perf_counter() - request_started
+
+            for key, index in (("first_screen_s", 0), ("second_screen_s", 1)):
+                filename, content = make_resume(index, "mix", 400)
+                request_started = time.perf_counter()
+                response = await client.post(
+                    "/screen",
+                    data={"job_id": str(job_id)},
+                    files={"file": (filename, content, "application/octet-stream")}
+                )
+                response.raise_for_status()
+                timings[key] = time.perf_counter() - request_started
+            timings["ready_s"] = time.perf_counter() - started
+    finally:
+        await main.app.router.shutdown()
+
+
+def run_child(workdir):
+    # One cold process: everything below is measured from the first app import
+    import asyncio
+
+    os.chdir(workdir)
+    timings = {}
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        import main
+        timings["import_s"] = time.perf_counter() - started
+        from benchmarks.stub_llm import install_stub
+        install_stub(latency_ms=0, jitter=0)
+        asyncio.run(measure_requests(main, timings, started))
+    print(json.dumps({key: round(value, 4) for key, value in timings.items()}))
+
+
+def importtime_top(workdir, top):
+    # Cumulative import time per module, slowest first (microseconds in python's output)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=workdir, env=child_environment(workdir), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, module = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        rows.append({"module": module, "cumulative_ms": round(int(cumulative_us) / 1000, 1), "self_ms": round(int(self_us) / 1000, 1)})
+    rows.sort(key=lambda row: -row["cumulative_ms"])
+    return rows[:top]
+
+
+def summarize(runs):
+    summary = {}
+    for phase in PHASES:
+        values = [run[phase] for run in runs if phase in run]
+        if values:
+            summary[phase] = {
+                "median": round(statistics.median(values), 4),
+                "min": round(min(values), 4),
+                "max": round(max(values), 4),
+            }
+    return summary
+
+
+def compare(report, baseline):
+    lines = []
+    for phase, stats in report["phases"].items():
+        base = baseline.get("phases", {}).get(phase)
+        if base and base.get("median"):
+            change = (stats["median"] - base["median"]) / base["median"] * 100
+            lines.append(f"{phase}: median {base['median']}s -> {stats['median']}s ({change:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        return run_child(args.child)
+
+    runs = []
+    for index in range(args.runs):
+        # A fresh interpreter and database per run, so nothing is warm
+        workdir = tempfile.mkdtemp(prefix="resume-startup-")
+        process_started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", workdir],
+            cwd=REPO_ROOT, env=child_environment(workdir), capture_output=True, text=True
+        )
+        wall = time.perf_counter() - process_started
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            raise SystemExit(f"startup run {index + 1} failed")
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        run["process_wall_s"] = round(wall, 4)
+        runs.append(run)
+        print(f"⏱️ run {index + 1}: import {run['import_s']}s  startup {run['startup_s']}s  "
+              f"first /screen {run['first_screen_s']}s  ready {run['ready_s']}s", file=sys.stderr)
+
+    report = {
+        "meta": {"commit": git_commit(), "python": sys.version.split()[0], "runs": args.runs},
+        "phases": summarize(runs),
+        "process_wall_s": round(statistics.median(run["process_wall_s"] for run in runs), 4),
+        "runs": runs,
+    }
+    if args.importtime_top:
+        report["slowest_imports"] = importtime_top(tempfile.mkdtemp(prefix="resume-startup-"), args.importtime_top)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
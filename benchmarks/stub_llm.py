@@ -0,0 +1,90 @@
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubLLMError(Exception):
+    pass
+
+
+class StubGenerativeModel:
+    # Offline stand-in for a Gemini GenerativeModel: answers each prompt kind in the shape the parsers
+    # expect, after a configurable latency, failing a configurable fraction of calls
+
+    def __init__(self, model_name="stub", latency_ms=200.0, jitter=0.2, failure_rate=0.0, seed=0):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+
+    def _score(self, prompt):
+        # Deterministic per prompt, so runs are comparable
+        return (zlib.crc32(prompt.encode("utf-8")) % 1000) / 1000
+
+    def _answer(self, prompt):
+        if "JSON array" in prompt:
+            jobs = re.findall(r"### Job (\d+)\nJob Title: (.*)", prompt)
+            return json.dumps([
+                {
+                    "index": int(index),
+                    "job_title": title.strip(),
+                    "ats_score": int(self._score(prompt + index) * 100),
+                    "missing_skills": ["Docker", "Kubernetes"],
+                    "suggestions": ["Quantify achievements", "Add a projects section"],
+                }
+                for index, title in jobs
+            ])
+        if "Suggestions to Improve Resume" in prompt:
+            score = int(self._score(prompt) * 100)
+            return (
+                f"###  ATS Score\n**ATS Score: {score}**\n\n"
+                "###  Missing Skills\n- Docker\n- Kubernetes\n\n"
+                "###  Suggestions to Improve Resume\n- Quantify achievements\n- Add a projects section"
+            )
+        if "important skills" in prompt:
+            return "- Python\n- SQL\n- FastAPI\n- Docker\n- Git\n- Communication\n- Problem Solving\n- REST APIs"
+        return f"{self._score(prompt):.2f}"
+
+    async def generate_content_async(self, prompt, **kwargs):
+        started = time.perf_counter()
+        self.calls += 1
+        delay = self.latency_ms / 1000 * (1 + self._rng.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(max(delay, 0))
+        self.busy_seconds += time.perf_counter() - started
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise StubLLMError("stub LLM failure")
+        return StubResponse(self._answer(prompt))
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return StubResponse(self._answer(prompt))
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "mean_latency_ms": round(self.busy_seconds / self.calls * 1000, 2) if self.calls else 0,
+        }
+
+
+def install_stub(latency_ms=200.0, jitter=0.2, failure_rate=0.0, seed=0):
+    # Swaps every model the shared LLM client hands out for one stub; must run before the app handles requests
+    from llm_client import llm_client
+
+    stub = StubGenerativeModel(latency_ms=latency_ms, jitter=jitter, failure_rate=failure_rate, seed=seed)
+    llm_client.set_model_factory(lambda model_name=None, *args, **kwargs: stub)
+    return stub
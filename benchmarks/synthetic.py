@@ -0,0 +1,105 @@
+import io
+import random
+
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Karan", "Meera", "Arjun", "Divya"]
+LAST_NAMES = ["Sharma", "Iyer", "Patel", "Reddy", "Gupta", "Nair", "Das", "Khan", "Mehta", "Rao"]
+SKILLS = [
+    "Python", "SQL", "FastAPI", "Django", "React", "JavaScript", "TypeScript", "Docker", "Kubernetes",
+    "AWS", "PostgreSQL", "Machine Learning", "Pandas", "NumPy", "Git", "REST APIs", "CI/CD", "Java",
+    "Spring Boot", "Node.js", "HTML", "CSS", "Figma", "TensorFlow", "PyTorch", "Linux", "Redis",
+]
+FILLER = (
+    "designed built maintained improved scaled migrated automated tested deployed services pipelines "
+    "dashboards features reports across teams with stakeholders reducing latency cost errors while "
+    "mentoring engineers reviewing code and documenting systems for production workloads"
+).split()
+
+
+def resume_text(index, words=400, rng=None):
+    # Plain-text resume with a unique email, so every synthetic upload is a distinct candidate
+    rng = rng or random.Random(index)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    skills = rng.sample(SKILLS, 8)
+    years = rng.randint(0, 12)
+    lines = [
+        name,
+        f"candidate{index}@bench.example",
+        f"Software engineer with {years} years of experience",
+        "Skills: " + ", ".join(skills),
+        "Experience",
+    ]
+    body = []
+    while len(body) < words:
+        body += rng.sample(FILLER, 10) + [rng.choice(skills) + "."]
+    body = body[:words]
+    # ~12 words per line keeps PDF lines inside the page width
+    lines += [" ".join(body[i:i + 12]) for i in range(0, len(body), 12)]
+    return "\n".join(lines)
+
+
+def make_docx(text):
+    import docx  # not at module level: the startup benchmark must not preload it
+
+    document = docx.Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(text, lines_per_page=50):
+    # Minimal PDF 1.4 writer (Helvetica, one text stream per page) so no PDF library is needed
+    lines = text.splitlines() or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects = []  # index 0 -> object 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # pages tree, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_ids = []
+    for page_lines in pages:
+        content = "BT /F1 10 Tf 14 TL 50 780 Td\n" + "".join(
+            f"({_pdf_escape(line)}) Tj T*\n" for line in page_lines
+        ) + "ET"
+        stream = content.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_resume(index, fmt="mix", words=400, seed=0):
+    # Returns (filename, bytes); "mix" alternates PDF and DOCX
+    rng = random.Random(seed * 1_000_003 + index)
+    text = resume_text(index, words, rng)
+    if fmt == "mix":
+        fmt = "pdf" if index % 2 == 0 else "docx"
+    if fmt == "pdf":
+        return f"resume_{index}.pdf", make_pdf(text)
+    return f"resume_{index}.docx", make_docx(text)
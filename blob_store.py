@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+from resume_extraction import file_extension
+
+
+RESUME_STORE_DIR = os.getenv("RESUME_STORE_DIR", "resume_store")
+# Per resume file; request bodies are capped on arrival by request_limits, this bounds the stored copy
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+STREAM_CHUNK_BYTES = 64 * 1024
+# An unreferenced blob younger than this is kept: an upload of the same content may not have committed its entry yet
+BLOB_GRACE_SECONDS = int(os.getenv("BLOB_GRACE_SECONDS", "300"))
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class StoredBlob:
+    def __init__(self, sha256, ext, size, path):
+        self.sha256 = sha256
+        self.ext = ext
+        self.size = size
+        self.path = path
+
+
+class ResumeStore:
+    # Resumes stored once per content hash under <root>/ab/cd/<sha256>.<ext>; writes are tmp file + rename
+
+    def __init__(self, root=RESUME_STORE_DIR, max_bytes=MAX_UPLOAD_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def path_for(self, sha256, ext):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}.{ext}")
+
+    def blob_ref(self, sha256, ext):
+        # Handle for a stored blob without touching the disk (size unknown)
+        return StoredBlob(sha256, ext, None, self.path_for(sha256, ext))
+
+    def blob(self, sha256, ext):
+        path = self.path_for(sha256, ext)
+        if not os.path.exists(path):
+            return None
+        return StoredBlob(sha256, ext, os.path.getsize(path), path)
+
+    def _write_stream(self, src, ext):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = src.read(STREAM_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLargeError(f"Upload exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256, ext)
+            if os.path.exists(path):
+                # Same resume already stored (re-upload, or applied to another job); touched so the grace
+                # period protects it until this upload's entry is committed
+                os.remove(tmp_path)
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return StoredBlob(sha256, ext, size, path)
+
+    async def save_stream(self, fileobj, filename) -> StoredBlob:
+        # Reads the upload in chunks in a thread; only one chunk is in memory at a time
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        return await asyncio.to_thread(self._write_stream, fileobj, file_extension(filename))
+
+    async def save_bytes(self, data: bytes, filename) -> StoredBlob:
+        return await self.save_stream(io.BytesIO(data), filename)
+
+    def remove(self, blob: StoredBlob, min_age_seconds=0):
+        # False if the blob is gone already or was written (or re-uploaded) less than min_age_seconds ago
+        try:
+            if min_age_seconds and time.time() - os.path.getmtime(blob.path) < min_age_seconds:
+                return False
+            os.remove(blob.path)
+        except OSError:
+            return False
+        return True
+
+    def iter_blobs(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root and "tmp" in dirnames:
+                dirnames.remove("tmp")
+            for name in filenames:
+                sha256, _, ext = name.partition(".")
+                path = os.path.join(dirpath, name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                yield StoredBlob(sha256, ext, size, path)
+
+
+resume_store = ResumeStore()
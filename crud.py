@@ -1,36 +1,170 @@
-# from sqlalchemy import select, delete
-# from sqlalchemy.ext.asyncio import AsyncSession
-# from models import ResumeLog
-# from schemas import ResumeLogCreate
-# from datetime import datetime
+import datetime
 
-# # Save a new resume log (insert or replace based on email)
-# async def save_resume_log(db: AsyncSession, log_data: ResumeLogCreate):
-#     # Check if record already exists for the email
-#     result = await db.execute(select(ResumeLog).where(ResumeLog.email == log_data.email))
-#     existing = result.scalar_one_or_none()
+from sqlalchemy import select, delete, tuple_, exists, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-#     if existing:
-#         # Update existing log with newer data
-#         for field, value in log_data.dict().items():
-#             setattr(existing, field, value)
-#         existing.timestamp = datetime.utcnow()
-#     else:
-#         new_log = ResumeLog(**log_data.dict())
-#         db.add(new_log)
+from blob_store import resume_store, StoredBlob, BLOB_GRACE_SECONDS
+from job_stats import apply_log_changes, refresh_last_application, lock_job_stats
+from search_index import index_resumes, delete_from_index
+from near_duplicates import duplicate_index
+from models import ResumeLog, ResumeFile
 
-#     await db.commit()
 
-# # Fetch all logs
-# async def get_all_logs(db: AsyncSession):
-#     result = await db.execute(select(ResumeLog))
-#     return result.scalars().all()
+# Columns refreshed when a candidate re-applies to the same job
+RESUME_LOG_UPDATE_COLUMNS = (
+    "name", "role", "experience_level", "final_score", "score_source", "status", "timestamp",
+)
 
-# # Delete a log by email
-# async def delete_log_by_email(db: AsyncSession, email: str):
-#     await db.execute(delete(ResumeLog).where(ResumeLog.email == email))
-#     await db.commit()
 
+def resume_log_upsert(dialect_name, rows):
+    # INSERT ... ON CONFLICT (job_id, email) DO UPDATE for Postgres and SQLite
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(ResumeLog).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[ResumeLog.job_id, ResumeLog.email],
+        set_={column: stmt.excluded[column] for column in RESUME_LOG_UPDATE_COLUMNS}
+    )
 
 
+def resume_log_values(result, job_id):
+    return {
+        "name": result["name"],
+        "email": result["email"],
+        "role": result["job_title"],
+        "experience_level": result["level"],
+        "final_score": result["final_score"],
+        "status": result["status"],
+        "score_source": result.get("score_source"),
+        "timestamp": datetime.datetime.utcnow(),
+        "job_id": job_id,
+    }
 
+
+def resume_file_upsert(dialect_name, rows):
+    # Re-applying to the same job points the (job_id, email) entry at the new blob
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(ResumeFile).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[ResumeFile.job_id, ResumeFile.email],
+        set_={column: stmt.excluded[column] for column in ("sha256", "ext", "size", "filename", "created_at")}
+    )
+
+
+def resume_file_values(blob, job_id, email, filename):
+    return {
+        "job_id": job_id,
+        "email": email,
+        "sha256": blob.sha256,
+        "ext": blob.ext,
+        "size": blob.size,
+        "filename": filename,
+        "created_at": datetime.datetime.utcnow(),
+    }
+
+
+# Columns job_stats (and the search index) need from a resume log being replaced or deleted
+STATS_COLUMNS = (ResumeLog.id, ResumeLog.job_id, ResumeLog.status, ResumeLog.final_score, ResumeLog.experience_level)
+
+
+async def existing_resume_logs(db: AsyncSession, pairs):
+    # Rows an upsert is about to replace, locked (on Postgres) until the caller commits; call lock_job_stats first
+    if not pairs:
+        return []
+    stmt = (
+        select(*STATS_COLUMNS)
+        .where(tuple_(ResumeLog.job_id, ResumeLog.email).in_(pairs))
+        .with_for_update()
+    )
+    return [dict(row._mapping) for row in (await db.execute(stmt)).all()]
+
+
+async def existing_resume_blobs(db: AsyncSession, pairs):
+    # Blobs behind the file entries an upsert is about to repoint
+    if not pairs:
+        return []
+    stmt = select(ResumeFile.sha256, ResumeFile.ext).where(tuple_(ResumeFile.job_id, ResumeFile.email).in_(pairs))
+    return [resume_store.blob_ref(sha256, ext) for sha256, ext in (await db.execute(stmt)).all()]
+
+
+# Save resume logs with their file entries and search index rows (insert or replace on the unique
+# (job_id, email) pair) and update job_stats, all in one transaction; the caller commits, then passes the
+# returned blobs (the ones re-applications replaced) to discard_unreferenced_blobs
+async def upsert_resume_logs(db: AsyncSession, rows: list, file_rows: list = None, search_rows: list = None):
+    dialect_name = db.bind.dialect.name
+    await lock_job_stats(db, [row["job_id"] for row in rows])
+    previous = await existing_resume_logs(db, [(row["job_id"], row["email"]) for row in rows])
+    replaced_blobs = await existing_resume_blobs(db, [(row["job_id"], row["email"]) for row in file_rows or []])
+    upserted = await db.execute(
+        resume_log_upsert(dialect_name, rows).returning(ResumeLog.id, ResumeLog.job_id, ResumeLog.email)
+    )
+    log_ids = {(job_id, email): log_id for log_id, job_id, email in upserted.all()}
+    await apply_log_changes(db, added=rows, removed=previous)
+    if file_rows:
+        await db.execute(resume_file_upsert(dialect_name, file_rows))
+    if search_rows:
+        await index_resumes(db, [
+            {**row, "log_id": log_ids[(row["job_id"], row["email"])]}
+            for row in search_rows if (row["job_id"], row["email"]) in log_ids
+        ])
+    return replaced_blobs
+
+
+async def upsert_resume_log(db: AsyncSession, values: dict, file_values: dict = None, search_values: dict = None):
+    return await upsert_resume_logs(
+        db,
+        [values],
+        [file_values] if file_values is not None else None,
+        [search_values] if search_values is not None else None,
+    )
+
+
+# An upload that could not be parsed is not kept, unless an application already uses the same content
+async def discard_unreferenced_blob(db: AsyncSession, blob: StoredBlob):
+    referenced = (await db.execute(select(exists().where(ResumeFile.sha256 == blob.sha256)))).scalar()
+    if not referenced:
+        resume_store.remove(blob)
+
+
+# Run after the commit that dropped the blobs' file entries: a blob no entry points to any more is deleted
+# from the store. Best effort; anything missed here (or still in its grace period) is left for
+# sweep_resume_store.py.
+async def discard_unreferenced_blobs(db: AsyncSession, blobs):
+    blobs = {blob.sha256: blob for blob in blobs or []}
+    if not blobs:
+        return
+    try:
+        referenced = set((await db.execute(
+            select(ResumeFile.sha256).where(ResumeFile.sha256.in_(list(blobs))).distinct()
+        )).scalars().all())
+        for sha256, blob in blobs.items():
+            if sha256 not in referenced:
+                resume_store.remove(blob, min_age_seconds=BLOB_GRACE_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Could not discard unreferenced resume blobs: {e}")
+
+
+async def delete_resume_files(db: AsyncSession, condition):
+    removed = await db.execute(delete(ResumeFile).where(condition).returning(ResumeFile.sha256, ResumeFile.ext))
+    return [resume_store.blob_ref(sha256, ext) for sha256, ext in removed.all()]
+
+
+# Remove one application (log, file entry, search entry, signature, its share of job_stats); the caller
+# commits, then passes the returned blobs to discard_unreferenced_blobs
+async def delete_application(db: AsyncSession, job_id, email):
+    await lock_job_stats(db, [job_id])
+    previous = await existing_resume_logs(db, [(job_id, email)])
+    await db.execute(delete(ResumeLog).where(ResumeLog.email == email, ResumeLog.job_id == job_id))
+    released_blobs = await delete_resume_files(db, and_(ResumeFile.email == email, ResumeFile.job_id == job_id))
+    await duplicate_index.delete(db, job_id, email)
+    if previous:
+        await delete_from_index(db, [row["id"] for row in previous])
+        await apply_log_changes(db, removed=previous)
+        await refresh_last_application(db, [job_id])
+    return released_blobs
+
+
+# File entries of a deleted job; same contract as delete_application
+async def delete_job_files(db: AsyncSession, job_id):
+    return await delete_resume_files(db, ResumeFile.job_id == job_id)
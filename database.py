@@ -1,23 +1,95 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import inspect, text
 # import os
 from dotenv import load_dotenv
 import os
+from search_index import create_search_index
 
 load_dotenv()  # 👈 This must be called before you use os.getenv
 
 DB_URL = os.getenv("DATABASE_URL")
 
-DB_URL =os.getenv("DATABASE_URL")
+# Statement logging is synchronous and costs time on every query; turn it on per environment when debugging
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# Connection pool sizing (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Recycle connections older than this (-1 = never); set below the server's / proxy's idle timeout
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() not in ("0", "false", "no")
+
+
+def engine_options(url):
+    options = {"echo": SQL_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        )
+    return options
+
 
 Base = declarative_base()
-engine = create_async_engine(DB_URL, echo=True)
+engine = create_async_engine(DB_URL, **engine_options(DB_URL))
 async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
 
+# create_all only creates missing tables; add new nullable columns to existing ones
+def add_missing_columns(sync_conn):
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def missing_indexes(sync_conn):
+    # (table, index) pairs declared on the models but not yet in the database
+    inspector = inspect(sync_conn)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing += [(table, index) for index in table.indexes if index.name not in existing]
+    return missing
+
+def duplicate_groups(sync_conn, table, index, limit=None):
+    # Key values held by more than one row, which keep a unique index from being built
+    columns = ", ".join(column.name for column in index.columns)
+    sql = f"SELECT {columns}, COUNT(*) AS copies FROM {table.name} GROUP BY {columns} HAVING COUNT(*) > 1"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sync_conn.execute(text(sql)).all()
+
+# Indexes declared after a table was first created are not added by create_all either.
+# Rows are never deleted here: duplicates in the way of a unique index stop startup, and
+# dedupe_unique_indexes.py removes them once someone has looked at them.
+def add_missing_indexes(sync_conn):
+    for table, index in missing_indexes(sync_conn):
+        if index.unique:
+            duplicates = duplicate_groups(sync_conn, table, index, limit=5)
+            if duplicates:
+                print(f"❌ {table.name} has rows sharing {index.name} keys, e.g. {[tuple(row) for row in duplicates]}")
+                raise RuntimeError(
+                    f"Cannot create unique index {index.name}: {table.name} has duplicate rows. "
+                    f"Review them with `python dedupe_unique_indexes.py`, then remove them with --apply."
+                )
+        index.create(sync_conn)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_indexes)
+        await conn.run_sync(create_search_index)
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+import models  # registers the tables on Base.metadata
+from database import engine, async_session, missing_indexes, duplicate_groups
+from job_stats import rebuild
+
+
+# One-off migration: unique indexes added to existing tables (e.g. one application per (job_id, email))
+# cannot be built while older duplicate rows exist. Dry run by default; --apply keeps the newest row
+# (highest id) of each group and deletes the rest.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Remove rows that block pending unique indexes")
+    parser.add_argument("--apply", action="store_true", help="delete the duplicates (default: only report them)")
+    return parser.parse_args(argv)
+
+
+def dedupe(sync_conn, apply=False):
+    removed = {}
+    for table, index in missing_indexes(sync_conn):
+        if not index.unique:
+            continue
+        groups = duplicate_groups(sync_conn, table, index)
+        if not groups:
+            continue
+        extra = sum(row.copies - 1 for row in groups)
+        print(f"🔁 {table.name}: {len(groups)} duplicate {index.name} keys, {extra} rows beyond the newest")
+        for row in groups[:20]:
+            print(f"   {tuple(row)[:-1]} x{row.copies}")
+        if not apply:
+            continue
+        if "id" not in table.c:
+            print(f"⚠️ {table.name} has no id column; resolve its duplicates by hand")
+            continue
+        columns = ", ".join(column.name for column in index.columns)
+        result = sync_conn.execute(text(
+            f"DELETE FROM {table.name} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {table.name} GROUP BY {columns})"
+        ))
+        removed[table.name] = result.rowcount
+        print(f"🗑️ {table.name}: deleted {result.rowcount} rows")
+    return removed
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    async with engine.begin() as conn:
+        removed = await conn.run_sync(dedupe, args.apply)
+    if removed.get("resume_logs"):
+        # The per-job counters still include the deleted applications
+        async with async_session() as db:
+            await rebuild(db)
+            await db.commit()
+    await engine.dispose()
+    if not args.apply:
+        print("Dry run; pass --apply to delete the duplicates")
+    elif removed:
+        print("✅ Done; restart the app to build the unique indexes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
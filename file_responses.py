@@ -0,0 +1,88 @@
+import datetime
+import os
+import re
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+
+# Resume URLs can be re-pointed by a re-upload, so they are revalidated rather than cached forever
+RESUME_CACHE_SECONDS = int(os.getenv("RESUME_CACHE_SECONDS", "300"))
+CHUNK_BYTES = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    # Single byte range -> (start, end) inclusive; None = serve the whole file; "invalid" = 416.
+    # Multi-range requests are answered with the whole file, which RFC 9110 allows.
+    m = RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+    else:
+        # "bytes=-N": the last N bytes
+        start = max(size - int(m.group(2)), 0)
+        end = size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start, length):
+    # Sync generator; Starlette runs it in the threadpool
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_BYTES, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def not_modified(request: Request, etag, last_modified):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def file_response(request: Request, path, size, media_type, etag, last_modified: datetime.datetime, filename):
+    # GET for a stored file with conditional requests (ETag / Last-Modified) and single byte ranges
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": f"private, max-age={RESUME_CACHE_SECONDS}",
+        "Accept-Ranges": "bytes",
+    }
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = parse_range(range_header, size) if range_header and (not if_range or if_range == etag) else None
+
+    if byte_range == "invalid":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_file(path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers)
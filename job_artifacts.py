@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models import Job, JobArtifact
+from resume_screening_core import (
+    ROLE_SKILLS,
+    build_score_prompt_prefix,
+    get_required_skills_from_llm,
+    job_term_vector,
+)
+from skill_matcher import SkillMatcher, split_skills
+
+
+# Bump when the way artifacts are built changes, so stored rows get rebuilt
+ARTIFACT_SCHEMA_VERSION = 1
+MAX_LLM_SKILLS = 12
+# Artifacts built without LLM skills (call failed or returned nothing usable) are retried after this long
+ARTIFACT_RETRY_SECONDS = int(os.getenv("ARTIFACT_RETRY_SECONDS", "300"))
+
+
+def job_source_hash(job: Job) -> str:
+    source = json.dumps([job.title, job.description or "", job.required_skills or ""])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def job_artifact_upsert(dialect_name, values):
+    # Whoever writes last wins, and the version keeps counting; no IntegrityError when two builds race
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(JobArtifact).values(version=1, **values)
+    set_ = {column: stmt.excluded[column] for column in values if column != "job_id"}
+    set_["version"] = JobArtifact.__table__.c.version + 1
+    return stmt.on_conflict_do_update(index_elements=[JobArtifact.job_id], set_=set_).returning(
+        *JobArtifact.__table__.c
+    )
+
+
+def clean_llm_skills(lines):
+    # Gemini bullets come back as "1. **Python**", "- SQL", "Skills:" ...
+    skills = []
+    for line in lines:
+        line = re.sub(r"^\s*(?:\d+[\.\)]\s*)?", "", line).replace("*", "").strip(" -•:")
+        if line and len(line) <= 60 and not line.lower().startswith(("here", "skills")):
+            skills.append(line)
+    return split_skills(skills)[:MAX_LLM_SKILLS]
+
+
+async def derive_skills(job: Job):
+    skills = split_skills(job.required_skills)
+    if skills:
+        return skills, "admin"
+    skills = clean_llm_skills(await get_required_skills_from_llm(job.title, job.description or ""))
+    if skills:
+        return skills, "llm"
+    return sorted(ROLE_SKILLS.get(job.title, set())), "role_default"
+
+
+class JobArtifacts:
+    # Ready-to-use form of a JobArtifact row
+
+    def __init__(self, row: JobArtifact):
+        self.job_id = row.job_id
+        self.version = row.version
+        self.schema_version = row.schema_version
+        self.source_hash = row.source_hash
+        self.skills = json.loads(row.skills)
+        self.skills_source = row.skills_source
+        self.updated_at = row.updated_at
+        vector = json.loads(row.term_vector)
+        self.term_vector = (
+            np.asarray(vector["indices"], dtype=np.int64),
+            np.asarray(vector["counts"], dtype=np.float64)
+        )
+        self.prompt_prefix = row.prompt_prefix
+        self.matcher = SkillMatcher(self.skills)
+
+    def is_current(self, job: Job):
+        return self.schema_version == ARTIFACT_SCHEMA_VERSION and self.source_hash == job_source_hash(job)
+
+    def needs_retry(self):
+        # role_default is a fallback, not an answer: a failed skills call must not stick until the job is edited
+        if self.skills_source != "role_default":
+            return False
+        return self.updated_at is None or datetime.utcnow() - self.updated_at >= timedelta(seconds=ARTIFACT_RETRY_SECONDS)
+
+
+class JobArtifactStore:
+    # DB-backed artifacts with an in-process copy; freshness is checked against the job row on every lookup
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+        # job_id -> background rebuild; also keeps a reference so the task is not garbage collected
+        self._pending = {}
+
+    async def rebuild(self, db: AsyncSession, job: Job) -> JobArtifacts:
+        skills, skills_source = await derive_skills(job)
+        indices, counts = job_term_vector(job.title, job.description)
+
+        row = (await db.execute(job_artifact_upsert(db.bind.dialect.name, {
+            "job_id": job.id,
+            "schema_version": ARTIFACT_SCHEMA_VERSION,
+            "source_hash": job_source_hash(job),
+            "skills": json.dumps(skills),
+            "skills_source": skills_source,
+            "term_vector": json.dumps({"indices": indices.tolist(), "counts": counts.tolist()}),
+            "prompt_prefix": build_score_prompt_prefix(job.title, job.description),
+            "updated_at": datetime.utcnow(),
+        }))).one()
+        await db.commit()
+
+        artifacts = JobArtifacts(row)
+        with self._lock:
+            self._cache[job.id] = artifacts
+        return artifacts
+
+    async def get(self, db: AsyncSession, job: Job) -> JobArtifacts:
+        with self._lock:
+            artifacts = self._cache.get(job.id)
+        if artifacts is None or not artifacts.is_current(job):
+            row = await db.get(JobArtifact, job.id)
+            artifacts = JobArtifacts(row) if row is not None else None
+            if artifacts is None or not artifacts.is_current(job):
+                # Missing or stale (job edited by another worker, schema bump, job older than artifacts)
+                return await self._wait_for_build(job)
+            with self._lock:
+                self._cache[job.id] = artifacts
+        if artifacts.needs_retry():
+            # Keep screening with the fallback skills while the LLM is asked again
+            self.schedule_rebuild(job.id, retry=True)
+        return artifacts
+
+    async def _wait_for_build(self, job: Job) -> JobArtifacts:
+        # Joins the build already in flight for the job (one LLM call however many screenings wait on it);
+        # if that one read an older version of the job, a second build follows it. Builds run on their own
+        # session, so the caller's transaction is left alone. Shielded: a cancelled request must not cancel
+        # the build other requests are waiting on.
+        for retry in (True, False):
+            artifacts = await asyncio.shield(self.schedule_rebuild(job.id, retry=retry))
+            if artifacts is not None and artifacts.is_current(job):
+                return artifacts
+        raise RuntimeError(f"Could not build artifacts for job {job.id}")
+
+    def schedule_rebuild(self, job_id, retry=False):
+        # Off the request path: the skills prompt can take seconds. A retry joins a rebuild already
+        # running for the job; a job edit always starts a new one, queued behind the running one so builds
+        # for a job never overlap and the last one reads the edited row.
+        pending = self._pending.get(job_id)
+        if retry and pending is not None and not pending.done():
+            return pending
+        task = asyncio.create_task(self._rebuild_job(job_id, after=pending))
+        self._pending[job_id] = task
+        task.add_done_callback(lambda done: self._pending.pop(job_id, None) if self._pending.get(job_id) is done else None)
+        return task
+
+    async def _rebuild_job(self, job_id, after=None):
+        # Best effort: if this fails, the next screening for the job asks for a build again
+        if after is not None and not after.done():
+            await asyncio.wait([after])
+        try:
+            async with async_session() as db:
+                job = await db.get(Job, job_id)
+                if job is not None:
+                    return await self.rebuild(db, job)
+        except Exception as e:
+            print(f"⚠️ Could not build artifacts for job {job_id}: {e}")
+
+    async def delete(self, db: AsyncSession, job_id):
+        # Caller commits together with the job delete
+        await db.execute(delete(JobArtifact).where(JobArtifact.job_id == job_id))
+        self.invalidate(job_id)
+
+    def invalidate(self, job_id):
+        with self._lock:
+            self._cache.pop(job_id, None)
+
+
+job_artifacts = JobArtifactStore()
@@ -0,0 +1,88 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from database import async_session
+from models import Job
+from schemas import JobOut
+
+
+# Upper bound on staleness when another worker process changed a job
+JOBS_CACHE_TTL_SECONDS = int(os.getenv("JOBS_CACHE_TTL_SECONDS", "60"))
+
+
+class ActiveJobsCache:
+    # Serialized GET /jobs body; dropped on job create/update/delete and when the earliest deadline passes
+
+    def __init__(self, ttl_seconds=JOBS_CACHE_TTL_SECONDS):
+        self.ttl = datetime.timedelta(seconds=ttl_seconds)
+        self._entry = None  # (body, etag, expires_at)
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._entry = None
+
+    def _fresh(self, now):
+        entry = self._entry
+        if entry is not None and now < entry[2]:
+            return entry
+        return None
+
+    async def _load(self, now):
+        async with async_session() as db:
+            result = await db.execute(select(Job).where(Job.deadline > now).order_by(Job.deadline, Job.id))
+            jobs = result.scalars().all()
+        body = json.dumps(
+            jsonable_encoder([JobOut.model_validate(job) for job in jobs]), separators=(",", ":")
+        ).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        # The listing changes as soon as the first job in it expires
+        expires_at = now + self.ttl
+        if jobs:
+            deadline = jobs[0].deadline
+            if deadline.tzinfo is not None:
+                deadline = deadline.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            expires_at = min(expires_at, deadline)
+        return body, etag, expires_at
+
+    async def get(self):
+        now = datetime.datetime.utcnow()
+        entry = self._fresh(now)
+        if entry is not None:
+            self.hits += 1
+            return entry[0], entry[1]
+
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            entry = self._fresh(now)
+            if entry is not None:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            generation = self._generation
+            entry = await self._load(now)
+            # Do not store a listing read before a concurrent invalidate
+            if generation == self._generation:
+                self._entry = entry
+            return entry[0], entry[1]
+
+    def stats(self):
+        entry = self._entry
+        return {
+            "cached": entry is not None,
+            "expires_at": entry[2].isoformat() if entry else None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+active_jobs_cache = ActiveJobsCache()
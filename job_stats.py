@@ -0,0 +1,198 @@
+import bisect
+import datetime
+
+from sqlalchemy import select, delete, update, func, case, and_, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Job, JobStats, ResumeLog
+
+
+SCORE_BUCKETS = 10
+# Lower bound of each histogram bucket; Python and SQL compare against the same literals
+SCORE_BOUNDS = [i / SCORE_BUCKETS for i in range(SCORE_BUCKETS)]
+LEVELS = ("junior", "mid", "senior")
+COUNTER_COLUMNS = (
+    "applications", "accepted", "rejected", *(f"level_{level}" for level in LEVELS), "score_sum",
+    *(f"score_{i}" for i in range(SCORE_BUCKETS)),
+)
+
+
+def score_bucket(score):
+    return max(bisect.bisect_right(SCORE_BOUNDS, score) - 1, 0)
+
+
+def contribution(status, final_score, level):
+    # What one resume_logs row adds to its job's counters
+    delta = {"applications": 1}
+    if status == "ACCEPTED":
+        delta["accepted"] = 1
+    elif status == "REJECTED":
+        delta["rejected"] = 1
+    if level in LEVELS:
+        delta[f"level_{level}"] = 1
+    if final_score is not None:
+        delta["score_sum"] = final_score
+        delta[f"score_{score_bucket(final_score)}"] = 1
+    return delta
+
+
+def job_stats_upsert(dialect_name, rows):
+    # Counters are added to in SQL, so concurrent writers for one job never lose each other's updates
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(JobStats).values(rows)
+    table = JobStats.__table__
+    set_ = {column: table.c[column] + stmt.excluded[column] for column in COUNTER_COLUMNS}
+    set_["last_application_at"] = case(
+        (table.c.last_application_at.is_(None), stmt.excluded.last_application_at),
+        (stmt.excluded.last_application_at > table.c.last_application_at, stmt.excluded.last_application_at),
+        else_=table.c.last_application_at,
+    )
+    set_["updated_at"] = stmt.excluded.updated_at
+    return stmt.on_conflict_do_update(index_elements=[JobStats.job_id], set_=set_)
+
+
+async def lock_job_stats(db: AsyncSession, job_ids):
+    # Must run before reading the logs an upsert is about to replace. A zero-delta upsert of the jobs' rows
+    # takes their row locks on Postgres (creating missing rows) and the write lock on SQLite, so writers for
+    # one job queue up here and each then sees the applications the others committed; without it two
+    # first-time uploads for the same (job_id, email) would both count as new. Sorted to avoid deadlocks.
+    job_ids = sorted({job_id for job_id in job_ids if job_id is not None})
+    if not job_ids:
+        return
+    now = datetime.datetime.utcnow()
+    rows = [
+        {**dict.fromkeys(COUNTER_COLUMNS, 0), "job_id": job_id, "last_application_at": None, "updated_at": now}
+        for job_id in job_ids
+    ]
+    await db.execute(job_stats_upsert(db.bind.dialect.name, rows))
+
+
+async def apply_log_changes(db: AsyncSession, added=(), removed=()):
+    # `added` / `removed` are resume_logs rows as dicts (job_id, status, final_score, experience_level,
+    # timestamp). A re-application is the old row removed plus the new one added. The caller commits.
+    now = datetime.datetime.utcnow()
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for row in rows:
+            job_id = row.get("job_id")
+            if job_id is None:
+                continue
+            delta = deltas.get(job_id)
+            if delta is None:
+                delta = deltas[job_id] = dict.fromkeys(COUNTER_COLUMNS, 0)
+                delta.update(job_id=job_id, last_application_at=None, updated_at=now)
+            for column, value in contribution(row.get("status"), row.get("final_score"), row.get("experience_level")).items():
+                delta[column] += sign * value
+            timestamp = row.get("timestamp")
+            if sign > 0 and timestamp is not None:
+                delta["last_application_at"] = max(filter(None, (delta["last_application_at"], timestamp)))
+    if deltas:
+        await db.execute(job_stats_upsert(db.bind.dialect.name, list(deltas.values())))
+
+
+async def refresh_last_application(db: AsyncSession, job_ids):
+    # A delete can remove the newest application; one indexed MAX per job (ix_resume_logs_job_timestamp)
+    latest = (
+        select(func.max(ResumeLog.timestamp))
+        .where(ResumeLog.job_id == JobStats.job_id)
+        .scalar_subquery()
+    )
+    await db.execute(update(JobStats).where(JobStats.job_id.in_(job_ids)).values(last_application_at=latest))
+
+
+async def rebuild(db: AsyncSession, job_ids=None):
+    # Recomputes the counters from resume_logs, e.g. for logs written before job_stats existed. The caller commits.
+    score = ResumeLog.final_score
+    buckets = []
+    for i, lower in enumerate(SCORE_BOUNDS):
+        if i == 0:
+            condition = score < SCORE_BOUNDS[1]
+        elif i == SCORE_BUCKETS - 1:
+            condition = score >= lower
+        else:
+            condition = and_(score >= lower, score < SCORE_BOUNDS[i + 1])
+        buckets.append(func.sum(case((condition, 1), else_=0)).label(f"score_{i}"))
+
+    stmt = (
+        select(
+            ResumeLog.job_id,
+            func.count().label("applications"),
+            func.sum(case((ResumeLog.status == "ACCEPTED", 1), else_=0)).label("accepted"),
+            func.sum(case((ResumeLog.status == "REJECTED", 1), else_=0)).label("rejected"),
+            *(
+                func.sum(case((ResumeLog.experience_level == level, 1), else_=0)).label(f"level_{level}")
+                for level in LEVELS
+            ),
+            func.coalesce(func.sum(score), 0).label("score_sum"),
+            *buckets,
+            func.max(ResumeLog.timestamp).label("last_application_at"),
+        )
+        .join(Job, Job.id == ResumeLog.job_id)
+        .group_by(ResumeLog.job_id)
+    )
+    clear = delete(JobStats)
+    if job_ids is not None:
+        stmt = stmt.where(ResumeLog.job_id.in_(job_ids))
+        clear = clear.where(JobStats.job_id.in_(job_ids))
+
+    now = datetime.datetime.utcnow()
+    rows = [{**row._mapping, "updated_at": now} for row in (await db.execute(stmt)).all()]
+    await db.execute(clear)
+    if rows:
+        await db.execute(JobStats.__table__.insert(), rows)
+    return len(rows)
+
+
+async def backfill_if_empty(db: AsyncSession):
+    # First start after upgrading: the table exists but the logs already written are not counted yet
+    has_stats = (await db.execute(select(exists().where(JobStats.job_id.isnot(None))))).scalar()
+    has_logs = (await db.execute(select(exists().where(ResumeLog.job_id.isnot(None))))).scalar()
+    if has_stats or not has_logs:
+        return 0
+    count = await rebuild(db)
+    await db.commit()
+    print(f"📊 Job stats backfilled for {count} jobs")
+    return count
+
+
+async def delete_job_stats(db: AsyncSession, job_id):
+    # Caller commits together with the job delete
+    await db.execute(delete(JobStats).where(JobStats.job_id == job_id))
+
+
+def serialize_job_stats(job_id, title, stats):
+    # Jobs without any application yet have no row
+    counts = {column: getattr(stats, column) if stats is not None else 0 for column in COUNTER_COLUMNS}
+    histogram = [counts[f"score_{i}"] for i in range(SCORE_BUCKETS)]
+    scored = sum(histogram)
+    decided = counts["accepted"] + counts["rejected"]
+    return {
+        "job_id": job_id,
+        "job_title": title,
+        "applications": counts["applications"],
+        "accepted": counts["accepted"],
+        "rejected": counts["rejected"],
+        "acceptance_rate": round(counts["accepted"] / decided, 4) if decided else None,
+        "mean_score": round(counts["score_sum"] / scored, 4) if scored else None,
+        "score_histogram": [
+            {"min": lower, "max": round(lower + 1 / SCORE_BUCKETS, 2), "count": count}
+            for lower, count in zip(SCORE_BOUNDS, histogram)
+        ],
+        "levels": {level: counts[f"level_{level}"] for level in LEVELS},
+        "last_application_at": stats.last_application_at if stats is not None else None,
+    }
+
+
+async def job_stats_for_admin(db: AsyncSession, created_by, job_id=None):
+    # One row per job (O(jobs)), however many applications there are
+    stmt = (
+        select(Job.id, Job.title, JobStats)
+        .outerjoin(JobStats, JobStats.job_id == Job.id)
+        .where(Job.created_by == created_by)
+        .order_by(Job.id)
+    )
+    if job_id is not None:
+        stmt = stmt.where(Job.id == job_id)
+    return [serialize_job_stats(job_id, title, stats) for job_id, title, stats in (await db.execute(stmt)).all()]
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, func, bindparam
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import async_session
+from metrics import timed_stage
+from models import LLMCacheEntry
+
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+# Expired/overflow rows are pruned once every N writes
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "200"))
+# Hit counts / last-used times are kept in memory and written back in one statement once this many keys are pending
+LLM_CACHE_HIT_FLUSH_EVERY = int(os.getenv("LLM_CACHE_HIT_FLUSH_EVERY", "100"))
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_cache_key(resume_text, job_title, job_description, prompt_version, model_name) -> str:
+    parts = [
+        _sha256(resume_text),
+        _sha256(f"{job_title or ''}\0{job_description or ''}"),
+        prompt_version,
+        model_name,
+    ]
+    return _sha256(json.dumps(parts))
+
+
+class LLMCache:
+    # Response cache stored in the shared database so every worker sees the same entries
+
+    def __init__(self, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_entries=LLM_CACHE_MAX_ENTRIES, enabled=LLM_CACHE_ENABLED):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # key -> [hits, last_used_at] not yet written to the table
+        self._pending_hits = {}
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+            return getattr(self, field)
+
+    async def get(self, key):
+        if not self.enabled:
+            return None
+        now = datetime.utcnow()
+        try:
+            async with async_session() as session:
+                entry = await session.get(LLMCacheEntry, key)
+                if entry is None or entry.expires_at <= now:
+                    self._count("misses")
+                    return None
+        except SQLAlchemyError as e:
+            # A broken cache must never break scoring
+            print(f"⚠️ LLM cache lookup failed: {e}")
+            self._count("misses")
+            return None
+        # A hit stays a read: usage is recorded in memory and flushed in batches
+        self._count("hits")
+        if self._record_hit(key, now) >= LLM_CACHE_HIT_FLUSH_EVERY:
+            await self.flush_hits()
+        return entry.response_text
+
+    def _record_hit(self, key, now):
+        with self._lock:
+            pending = self._pending_hits.setdefault(key, [0, now])
+            pending[0] += 1
+            pending[1] = max(pending[1], now)
+            return len(self._pending_hits)
+
+    async def flush_hits(self):
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+        try:
+            async with async_session() as session:
+                await session.execute(
+                    update(LLMCacheEntry.__table__)
+                    .where(LLMCacheEntry.__table__.c.key == bindparam("cache_key"))
+                    .values(
+                        hit_count=LLMCacheEntry.__table__.c.hit_count + bindparam("hits"),
+                        last_used_at=bindparam("used_at"),
+                    ),
+                    [{"cache_key": key, "hits": hits, "used_at": used_at} for key, (hits, used_at) in pending.items()]
+                )
+                await session.commit()
+        except SQLAlchemyError as e:
+            # Usage counts only steer pruning; losing a batch is harmless
+            print(f"⚠️ LLM cache hit flush failed: {e}")
+
+    async def set(self, key, response_text, model_name, prompt_version):
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        try:
+            async with async_session() as session:
+                entry = await session.get(LLMCacheEntry, key)
+                if entry is None:
+                    session.add(LLMCacheEntry(
+                        key=key,
+                        model_name=model_name,
+                        prompt_version=prompt_version,
+                        response_text=response_text,
+                        created_at=now,
+                        expires_at=now + self.ttl,
+                        last_used_at=now,
+                        hit_count=0,
+                    ))
+                else:
+                    entry.response_text = response_text
+                    entry.created_at = now
+                    entry.expires_at = now + self.ttl
+                    entry.last_used_at = now
+                await session.commit()
+        except IntegrityError:
+            # Another worker stored the same key first
+            pass
+        except SQLAlchemyError as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+            return
+
+        if self._count("writes") % LLM_CACHE_PRUNE_EVERY == 0:
+            await self.prune()
+
+    async def get_or_generate(self, generate, resume_text, job_title, job_description, prompt_version, model_name, validate=None):
+        # `generate` is an async callable returning the raw response text; a response `validate` rejects
+        # (by raising) is not cached
+        key = make_cache_key(resume_text, job_title, job_description, prompt_version, model_name)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        with timed_stage("llm"):
+            response_text = await generate()
+        if validate is not None:
+            validate(response_text)
+        await self.set(key, response_text, model_name, prompt_version)
+        return response_text
+
+    async def prune(self):
+        # Drop expired rows, then the least recently used rows above the size bound
+        await self.flush_hits()
+        try:
+            async with async_session() as session:
+                await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.utcnow()))
+                total = (await session.execute(select(func.count()).select_from(LLMCacheEntry))).scalar_one()
+                overflow = total - self.max_entries
+                if overflow > 0:
+                    stale = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_used_at.asc()).limit(overflow)
+                    await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(stale)))
+                await session.commit()
+        except SQLAlchemyError as e:
+            print(f"⚠️ LLM cache prune failed: {e}")
+
+    async def stats(self):
+        with self._lock:
+            local = {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+        lookups = local["hits"] + local["misses"]
+        local["hit_ratio"] = round(local["hits"] / lookups, 4) if lookups else 0.0
+        await self.flush_hits()
+        try:
+            async with async_session() as session:
+                row = (await session.execute(
+                    select(func.count(), func.coalesce(func.sum(LLMCacheEntry.hit_count), 0))
+                )).one()
+            local["entries"] = row[0]
+            local["total_hits"] = int(row[1])
+        except SQLAlchemyError:
+            pass
+        return local
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+
+from dotenv import load_dotenv
+
+from metrics import LLM_CALLS
+
+
+load_dotenv()
+
+# Shared by every Gemini call in the process
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Deadline for one attempt, and for all attempts of one call together
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "60"))
+LLM_TOTAL_DEADLINE_SECONDS = float(os.getenv("LLM_TOTAL_DEADLINE_SECONDS", "120"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "10"))
+# Consecutive failed calls that open the breaker, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Build the Gemini client in a background thread at startup instead of on the first request
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() not in ("0", "false", "no")
+
+# 429 / 5xx from the API are worth retrying; 4xx like bad request or auth are not
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    # Rate limited, timed out or circuit open after retries; the caller should try again later
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def status_code(error):
+    # google.api_core exceptions carry the HTTP status as an int `code`
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    # Timeouts and connection errors are transient; a blocked or malformed response is not
+    return not isinstance(error, (ValueError, TypeError))
+
+
+def gemini_model(model_name):
+    # google.generativeai takes most of a second to import, so it is only loaded when a model is first needed
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(model_name)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    # closed -> open after `threshold` consecutive failures -> one trial call after `reset_seconds`
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        # True when this call is the half-open trial; the caller must then end it with end_trial()
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_running):
+            retry_after = self.reset_seconds - (time.monotonic() - self.opened_at)
+            raise LLMUnavailableError("LLM circuit breaker is open", retry_after=max(retry_after, 1))
+        if state == "half_open":
+            self._trial_running = True
+            return True
+        return False
+
+    def end_trial(self):
+        # A trial that ended without recording an outcome (cancelled, out of time) counts as a failure,
+        # so the breaker re-opens instead of refusing every call until restart
+        if self._trial_running:
+            self.record_failure()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    # One client per process: rate limit, concurrency cap, retries with jittered backoff,
+    # circuit breaker, and identical in-flight prompts coalesced into one call
+
+    def __init__(self):
+        self.bucket = TokenBucket(LLM_RATE_PER_SECOND, LLM_BURST)
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        self._slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self._models = {}
+        self._model_factory = gemini_model
+        self._inflight = {}
+
+    def set_model_factory(self, factory):
+        # Tests and benchmarks swap Gemini for a local stand-in
+        self._model_factory = factory
+        self._models.clear()
+
+    def model(self, model_name):
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = self._model_factory(model_name)
+        return model
+
+    async def warm_up(self, *model_names):
+        try:
+            for model_name in model_names:
+                await asyncio.to_thread(self.model, model_name)
+        except Exception as e:
+            # The first real call will try again and report it properly
+            print(f"⚠️ LLM warm-up failed: {e}")
+
+    async def generate(self, prompt, model_name, timeout=LLM_CALL_TIMEOUT_SECONDS):
+        key = hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(prompt, model_name, timeout))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            LLM_CALLS.inc(model=model_name, outcome="coalesced")
+        # Shielded: one waiter giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _generate(self, prompt, model_name, timeout):
+        deadline = time.monotonic() + LLM_TOTAL_DEADLINE_SECONDS
+        last_error = None
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            trial = self.breaker.before_call()
+            try:
+                await self.bucket.acquire()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    async with self._slots:
+                        response = await asyncio.wait_for(
+                            self.model(model_name).generate_content_async(prompt), timeout=min(timeout, remaining)
+                        )
+                    text = response.text
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    if isinstance(e, asyncio.TimeoutError):
+                        outcome = "timeout"
+                    elif status_code(e) == 429:
+                        outcome = "rate_limited"
+                    else:
+                        outcome = "error"
+                    LLM_CALLS.inc(model=model_name, outcome=outcome)
+                    if not retryable:
+                        # The request itself is bad; the service answered, so it counts as healthy
+                        self.breaker.record_success()
+                        raise LLMError(f"{e.__class__.__name__}: {e}") from e
+                    self.breaker.record_failure()
+                    last_error = e
+                else:
+                    self.breaker.record_success()
+                    LLM_CALLS.inc(model=model_name, outcome="ok")
+                    return text
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+            backoff = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+            delay = random.uniform(0, backoff)  # full jitter
+            if attempt == LLM_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                break
+            print(f"⚠️ LLM call failed ({last_error.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        reason = f"{last_error.__class__.__name__}: {last_error}" if last_error else "deadline exceeded"
+        raise LLMUnavailableError(f"LLM unavailable after retries ({reason})", retry_after=LLM_BACKOFF_MAX_SECONDS)
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": len(self._inflight),
+            "tokens": round(self.bucket.tokens, 2),
+        }
+
+
+llm_client = LLMClient()
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import smtplib
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from email.mime.text import MIMEText
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AdminConfig
+
+
+# Used when the sender has no AdminConfig row
+SMTP_DEFAULT_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_DEFAULT_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# Authenticated sessions kept open per sender; also the per-sender send concurrency
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# Idle sessions older than this are closed instead of reused (servers drop them anyway)
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+# Sender pools kept at once (one per host/user/password); the least recently used is closed beyond this
+SMTP_MAX_POOLS = int(os.getenv("SMTP_MAX_POOLS", "64"))
+# A definite login rejection (535) is answered from memory for this long instead of asking the server again
+SMTP_AUTH_ERROR_SECONDS = float(os.getenv("SMTP_AUTH_ERROR_SECONDS", "60"))
+EMAIL_BULK_MAX_RECIPIENTS = int(os.getenv("EMAIL_BULK_MAX_RECIPIENTS", "500"))
+
+# The message was refused but the session is still usable
+RECIPIENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class SMTPSettings:
+    def __init__(self, host, port, username, password):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+
+    @property
+    def key(self):
+        # A changed password gets a new pool
+        secret = hashlib.sha256((self.password or "").encode("utf-8")).hexdigest()
+        return (self.host, self.port, self.username, secret)
+
+
+def smtp_password_matches(config: AdminConfig, password):
+    return bool(password) and hmac.compare_digest(config.smtp_password.encode("utf-8"), password.encode("utf-8"))
+
+
+async def smtp_settings_for(db: AsyncSession, sender_email, sender_password):
+    # Every send carries the password. The sender's AdminConfig host is only used when that password is
+    # the one stored with it: anyone can write a config row, and a host planted by someone else must
+    # never receive the real password. Otherwise the default host is used.
+    config = await db.get(AdminConfig, sender_email)
+    if config is not None and smtp_password_matches(config, sender_password):
+        return SMTPSettings(config.smtp_host, config.smtp_port, config.smtp_username or sender_email, sender_password)
+    return SMTPSettings(SMTP_DEFAULT_HOST, SMTP_DEFAULT_PORT, sender_email, sender_password)
+
+
+def build_status_email(sender_email, to_email, name, status, best_role, company):
+    if status.lower() == "accepted":
+        body = f"""
+Dear {name},
+
+Thank you for applying to the {best_role} position at {company}.
+
+You have been shortlisted for the next stage of our recruitment process. We’ll contact you soon!
+
+Warm regards,
+HR Team
+"""
+    else:
+        body = f"""
+Dear {name},
+
+Thank you for your interest in the {best_role} position at {company}.
+
+We regret to inform you that we will not be moving forward with your application at this time.
+
+We wish you all the best in your job search.
+
+Sincerely,
+HR Team
+"""
+
+    msg = MIMEText(body)
+    msg["Subject"] = f"Application Status – {best_role} at {company}"
+    msg["From"] = sender_email
+    msg["To"] = to_email
+    return msg
+
+
+class SMTPConnectionPool:
+    # Authenticated sessions for one sender; smtplib is blocking, so every network call runs in a thread
+
+    def __init__(self, settings: SMTPSettings, size=SMTP_POOL_SIZE):
+        self.settings = settings
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []  # (connection, last used)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.sent = 0
+        self.closed = False
+        # (error, time) of the last 535: a rejected login is not retried for every queued message.
+        # Temporary refusals (454, "too many login attempts") are not kept, the next send tries again.
+        self.auth_error = None
+
+    def _connect(self):
+        if self.auth_error is not None:
+            error, rejected_at = self.auth_error
+            if time.monotonic() - rejected_at < SMTP_AUTH_ERROR_SECONDS:
+                raise error
+            self.auth_error = None
+        s = self.settings
+        # Verified certificates: the session carries the sender's password
+        context = ssl.create_default_context()
+        encrypted = True
+        if s.port == 465:
+            server = smtplib.SMTP_SSL(s.host, s.port, timeout=SMTP_TIMEOUT_SECONDS, context=context)
+        else:
+            server = smtplib.SMTP(s.host, s.port, timeout=SMTP_TIMEOUT_SECONDS)
+            server.ehlo()
+            encrypted = server.has_extn("starttls")
+            if encrypted:
+                server.starttls(context=context)
+                server.ehlo()
+        # Local stand-ins often do not offer AUTH
+        if s.password and server.has_extn("auth"):
+            if not encrypted:
+                server.close()
+                raise smtplib.SMTPNotSupportedError(
+                    f"{s.host}:{s.port} does not offer STARTTLS; refusing to send the password in plaintext"
+                )
+            try:
+                server.login(s.username, s.password)
+            except smtplib.SMTPAuthenticationError as e:
+                if e.smtp_code == 535:
+                    self.auth_error = (e, time.monotonic())
+                server.close()
+                raise
+            except Exception:
+                server.close()
+                raise
+        self.connections_opened += 1
+        return server
+
+    def _take_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                server, last_used = self._idle.pop()
+                if now - last_used < SMTP_IDLE_SECONDS:
+                    return server
+                server.close()
+        return None
+
+    def _release(self, server):
+        with self._lock:
+            if not self.closed:
+                self._idle.append((server, time.monotonic()))
+                return
+        # Pool was evicted while this send was on the wire
+        server.close()
+
+    def _deliver(self, server, from_addr, to_addr, message):
+        try:
+            server.sendmail(from_addr, to_addr, message)
+        except RECIPIENT_ERRORS:
+            self._release(server)
+            raise
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _send(self, server, from_addr, to_addr, message):
+        if server is not None:
+            try:
+                return self._deliver(server, from_addr, to_addr, message)
+            except smtplib.SMTPServerDisconnected:
+                pass  # stale idle session: reconnect once
+        return self._deliver(self._connect(), from_addr, to_addr, message)
+
+    async def send(self, from_addr, to_addr, message: str):
+        async with self._slots:
+            server = await asyncio.to_thread(self._send, self._take_idle(), from_addr, to_addr, message)
+            self.sent += 1
+            self._release(server)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+
+class SMTPPoolManager:
+
+    # LRU of pools: every distinct password submitted makes a key, so the map must not grow with them
+
+    def __init__(self, max_pools=SMTP_MAX_POOLS):
+        self.max_pools = max_pools
+        self._pools = OrderedDict()
+        self.evicted = 0
+
+    def get(self, settings: SMTPSettings) -> SMTPConnectionPool:
+        pool = self._pools.get(settings.key)
+        if pool is not None:
+            self._pools.move_to_end(settings.key)
+            return pool
+        pool = self._pools[settings.key] = SMTPConnectionPool(settings)
+        while len(self._pools) > self.max_pools:
+            _, evicted = self._pools.popitem(last=False)
+            evicted.close()
+            self.evicted += 1
+        return pool
+
+    async def send(self, settings: SMTPSettings, msg: MIMEText):
+        await self.get(settings).send(msg["From"], msg["To"], msg.as_string())
+
+    async def send_bulk(self, settings: SMTPSettings, messages):
+        # `messages` is a list of (recipient email, MIMEText or error string); returns one result per entry
+        pool = self.get(settings)
+
+        async def send_one(email, msg):
+            if isinstance(msg, str):
+                return {"email": email, "status": "failed", "error": msg}
+            try:
+                await pool.send(msg["From"], email, msg.as_string())
+                return {"email": email, "status": "sent"}
+            except Exception as e:
+                return {"email": email, "status": "failed", "error": str(e)}
+
+        # The pool's slots bound how many of these are on the wire at once
+        return await asyncio.gather(*(send_one(email, msg) for email, msg in messages))
+
+    def close_all(self):
+        pools, self._pools = self._pools, OrderedDict()
+        for pool in pools.values():
+            pool.close()
+
+    def stats(self):
+        return {
+            "pools": len(self._pools),
+            "evicted": self.evicted,
+            "connections_opened": sum(p.connections_opened for p in self._pools.values()),
+            "sent": sum(p.sent for p in self._pools.values()),
+        }
+
+
+smtp_pools = SMTPPoolManager()
@@ -1,22 +1,38 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form, Header
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import select, and_, delete
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, and_, or_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
-from database import get_db, init_db
-from models import ResumeLog, Job,AdminConfig
-from schemas import ResumeLogCreate, EmailRequest, JobOut, JobCreate,AdminConfigCreate,AdminConfigOut
-from resume_screening_core import analyze_resume
-import shutil, os, tempfile, smtplib, datetime, re
-from email.mime.text import MIMEText
+from database import get_db, init_db, async_session
+from models import ResumeLog, ResumeFile, Job,AdminConfig
+from crud import delete_application, delete_job_files, discard_unreferenced_blobs
+from job_stats import job_stats_for_admin, backfill_if_empty, delete_job_stats
+from search_index import search_resumes, reindex_missing
+from near_duplicates import duplicate_index
+from schemas import ResumeLogCreate, EmailRequest, BulkEmailRequest, JobOut, JobCreate,AdminConfigCreate,AdminConfigOut
+from resume_screening_core import analyze_resume_for_jobs, analyze_resume_batched, GEMINI_MODEL_NAME, GEMINI_CHEAP_MODEL_NAME
+from resume_extraction import extraction_service, ResumeParseError
+from parsing_executor import parsing_executor
+from screening import screen_upload
+from batch_queue import submit_batch, get_batch, BatchError, BATCH_MAX_REQUEST_BYTES
+from task_queue import task_queue, serialize_task, QueueFullError
+from llm_cache import llm_cache
+from skill_matcher import skill_matchers
+from job_artifacts import job_artifacts
+from write_buffer import result_write_buffer
+from job_listing import active_jobs_cache
+from blob_store import resume_store, UploadTooLargeError
+from file_responses import file_response
+from request_limits import RequestSizeLimitMiddleware
+from metrics import registry, timed_stage, TimingMiddleware
+from llm_client import llm_client, LLMError, LLMUnavailableError, LLM_WARMUP
+from mailer import smtp_pools, smtp_settings_for, smtp_password_matches, build_status_email, EMAIL_BULK_MAX_RECIPIENTS
+import os, datetime, base64, asyncio
 from fastapi import Query
-import docx
 import os
 import json
-import re
-import google.generativeai as genai
-import uvicorn
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,11 +45,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag", "Last-Modified", "Content-Range", "Accept-Ranges", "Server-Timing"],
 )
+# Request latency histogram, Server-Timing header, opt-in per-request profiling (X-Profile)
+app.add_middleware(TimingMiddleware)
+# Upload size caps applied while the body arrives, before Starlette spools it to disk
+app.add_middleware(RequestSizeLimitMiddleware, path_limits=[(r"^/jobs/\d+/screen/batch$", BATCH_MAX_REQUEST_BYTES)])
 
 @app.on_event("startup")
 async def startup():
     await init_db()
+    async with async_session() as db:
+        await backfill_if_empty(db)
+    parsing_executor.start()
+    result_write_buffer.start()
+    task_queue.start()
+    if LLM_WARMUP:
+        # Not awaited: requests are served while the Gemini client loads in a thread
+        app.state.llm_warmup = asyncio.create_task(llm_client.warm_up(GEMINI_MODEL_NAME, GEMINI_CHEAP_MODEL_NAME))
+
+@app.on_event("shutdown")
+async def shutdown():
+    await task_queue.shutdown()
+    # After the workers stop, so their last results are flushed too
+    await result_write_buffer.shutdown()
+    parsing_executor.shutdown()
+    smtp_pools.close_all()
+    await llm_cache.flush_hits()
 
 
 # ============ JOB ROUTES ============
@@ -43,113 +81,63 @@ async def create_job(job: JobCreate, db: AsyncSession = Depends(get_db)):
     new_job = Job(**job.dict())  # includes created_by
     db.add(new_job)
     await db.commit()
+    active_jobs_cache.invalidate()
+    job_artifacts.schedule_rebuild(new_job.id)
     return {"message": "Job created successfully"}
 
+def parse_job_lists(titles, descriptions):
+    # Form fields carry JSON arrays; bad input is the caller's error, checked before any work is queued
+    try:
+        titles, descriptions = json.loads(titles), json.loads(descriptions)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="titles and descriptions must be JSON arrays")
+    for name, values in (("titles", titles), ("descriptions", descriptions)):
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise HTTPException(status_code=422, detail=f"{name} must be a JSON array of strings")
+    if len(titles) != len(descriptions):
+        raise HTTPException(status_code=422, detail="titles and descriptions must have the same length")
+    return titles, descriptions
+
 @app.post("/analyze_resume")
 async def analyze_resume_multiple(
     # request: Request,
     file: UploadFile = File(...),
     titles: str = Form(...),
-    descriptions: str = Form(...)
+    descriptions: str = Form(...),
+    mode: str = Form("parallel"),  # "parallel" = one call per title, "batch" = one prompt for all titles
+    run_async: bool = Form(False),  # queue the analysis and return a task id (202)
+    db: AsyncSession = Depends(get_db)
 ):
+    titles, descriptions = parse_job_lists(titles, descriptions)
+    if run_async:
+        payload = {
+            "filename": file.filename,
+            "titles": titles,
+            "descriptions": descriptions,
+            "mode": mode
+        }
+        return await enqueue_task(db, "analyze", payload, await file.read(), file.filename)
+
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix="." + file.filename.split('.')[-1]) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        # Configure Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel("gemini-2.5-pro")
-
-        # Extract resume text
-        resume_text = ""
-        if file.filename.endswith(".pdf"):
-            import pdfplumber
-            with pdfplumber.open(tmp_path) as pdf:
-                resume_text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-        elif file.filename.endswith(".docx"):
-            import docx
-            doc = docx.Document(tmp_path)
-            resume_text = "\n".join(p.text for p in doc.paragraphs)
-
-        os.unlink(tmp_path)
+        # Extract resume text (cached by content hash)
+        with timed_stage("upload"):
+            file_content = await file.read()
+        resume_text = (await extraction_service.extract_async(file_content, file.filename))["text"]
 
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Resume could not be parsed.")
 
-        titles = json.loads(titles)
-        descriptions = json.loads(descriptions)
-
-        def extract_ats_score(text: str) -> int:
-            score_patterns = [
-                r"ATS Score\s*[:\-]?\s*(\d{1,3})",
-                r"score\s*(?:is|of)?\s*(\d{1,3})\s*(?:/100)?",
-                r"(\d{1,3})\s*/\s*100"
-            ]
-            for pattern in score_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    return min(max(int(match.group(1)), 0), 100)
-            return 0
-
-        results = []
-        for title, desc in zip(titles, descriptions):
-            prompt = f"""
-You are an expert ATS (Applicant Tracking System) resume reviewer.
-
-Please evaluate the given resume **strictly** for the job title and description provided.
-
-Your output must include the following **four sections** in this **exact format**, formatted clearly for human readability:
-
----
-
-###  Job Title  
-State the job title being analyzed.
-
-###  ATS Score  
-Return a numeric ATS Score (0 to 100), **formatted exactly like this**:  
-**ATS Score: <number>**
-
-This score should reflect how well the resume matches the job description based on:
-- Skill keyword matching
-- Relevance of experience
-- Formatting & structure
-- Language/tone
-
-###  Missing Skills  
-List the most important skills that are **mentioned in the job description but missing in the resume**.
-
-###  Suggestions to Improve Resume  
-Give **clear and actionable suggestions** to improve the resume for better alignment with this job, such as:
-- Skills to add
-- Experience to rephrase
-- Formatting tips
-
-Do **NOT** include any JSON or code formatting — return plain text only.
-
----
-
-📄 Resume:
-\"\"\"{resume_text}\"\"\"
-
-🧾 Job Title: {title}
-📝 Job Description:
-\"\"\"{desc}\"\"\"
-"""
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            print(" Gemini Raw Response:")
-            print(text) 
-            score = extract_ats_score(text)
-
-            results.append({
-                "job_title": title,
-                "ats_score": score,
-                "suggestions": text
-            })
+        if mode == "batch":
+            results = await analyze_resume_batched(resume_text, titles, descriptions)
+        else:
+            results = await analyze_resume_for_jobs(resume_text, titles, descriptions)
 
         return {"results": results}
 
+    except HTTPException:
+        raise
+    except ResumeParseError as e:
+        raise HTTPException(status_code=422, detail=f"Resume could not be parsed: {e}")
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -158,10 +146,13 @@ Do **NOT** include any JSON or code formatting — return plain text only.
 
 
 @app.get("/jobs", response_model=list[JobOut])
-async def get_active_jobs(db: AsyncSession = Depends(get_db)):
-    now = datetime.datetime.utcnow()
-    result = await db.execute(select(Job).where(Job.deadline > now))
-    return result.scalars().all()
+async def get_active_jobs(if_none_match: str = Header(None)):
+    # Served from the in-process cache; the database is only hit after a job change or deadline
+    body, etag = await active_jobs_cache.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 
@@ -175,8 +166,15 @@ async def delete_job(job_id: int, db: AsyncSession = Depends(get_db)):
     job = await db.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    await job_artifacts.delete(db, job_id)
+    await delete_job_stats(db, job_id)
+    await duplicate_index.delete_job(db, job_id)
+    released_blobs = await delete_job_files(db, job_id)
     await db.delete(job)
     await db.commit()
+    await discard_unreferenced_blobs(db, released_blobs)
+    active_jobs_cache.invalidate()
+    skill_matchers.invalidate(job_id)
     return {"message": "Job deleted"}
 
 @app.put("/jobs/{job_id}")
@@ -187,6 +185,9 @@ async def update_job(job_id: int, updated_job: JobCreate, db: AsyncSession = Dep
     for key, value in updated_job.dict().items():
         setattr(job, key, value)
     await db.commit()
+    active_jobs_cache.invalidate()
+    skill_matchers.invalidate(job_id)
+    job_artifacts.schedule_rebuild(job_id)
     return {"message": "Job updated"}
 
 
@@ -199,95 +200,275 @@ async def update_job(job_id: int, updated_job: JobCreate, db: AsyncSession = Dep
 async def screen_resume(
     file: UploadFile = File(...),
     job_id: int = Form(...),
+    run_async: bool = Form(False),  # queue the screening and return a task id (202)
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        #  Read the file once
-        file_content = await file.read()
-
-        #  Save to a temporary file for analysis
-        ext = file.filename.split('.')[-1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{ext}") as tmp:
-            tmp.write(file_content)
-            tmp_path = tmp.name
-
         job = await db.get(Job, job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
 
-        # Ensure upload folder exists
-        os.makedirs("uploaded_resumes", exist_ok=True)
-
-        # Run the analysis
-        result = await analyze_resume(
-            file_path=tmp_path,
-            job_title=job.title,
-            job_description=job.description,
-            job_id=job_id,
-            required_skills=job.required_skills,
-            thresholds={"junior": 0.45, "mid": 0.55, "senior": 0.6},
-            db=db
-        )
-
-        #  Save resume file using actual email
-        email = result["email"]
-        resume_path = os.path.join("uploaded_resumes", f"{email}.{ext}")
-        with open(resume_path, "wb") as f:
-            f.write(file_content)
+        #  Stream the upload into the content-addressed store (size-capped, hashed on the way)
+        with timed_stage("upload"):
+            blob = await resume_store.save_stream(file.file, file.filename)
 
-        #  Save to DB
-        await db.execute(
-            delete(ResumeLog).where(and_(ResumeLog.email == email, ResumeLog.job_id == job_id))
-        )
+        if run_async:
+            payload = {"job_id": job_id, "filename": file.filename, "sha256": blob.sha256, "ext": blob.ext}
+            return await enqueue_task(db, "screen", payload)
 
-        new_log = ResumeLog(
-            name=result["name"],
-            email=email,
-            role=result["job_title"],
-            experience_level=result["level"],
-            final_score=result["final_score"],
-            status=result["status"],
-            timestamp=datetime.datetime.utcnow(),
-            job_id=job_id
-        )
-        db.add(new_log)
-        await db.commit()
+        result = await screen_upload(db, job, blob, file.filename)
 
         return result
 
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except LLMUnavailableError as e:
+        # Nothing is stored; the client (or the task queue) retries later
+        retry_after = str(int(e.retry_after or 30))
+        raise HTTPException(status_code=503, detail=f"Scoring is temporarily unavailable: {e}", headers={"Retry-After": retry_after})
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=f"Scoring failed: {e}")
+    except ResumeParseError as e:
+        raise HTTPException(status_code=422, detail=f"Resume could not be parsed: {e}")
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Resume screening failed: {str(e)}")
 
+@app.post("/jobs/{job_id}/screen/batch", status_code=202)
+async def screen_resume_batch(
+    job_id: int,
+    files: list[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    # Accepts many PDF/DOCX files or ZIP archives and screens them in the background
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    try:
+        batch_id, total = await submit_batch(db, job_id, [(f.filename, f.file) for f in files])
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "batch_id": batch_id,
+        "job_id": job_id,
+        "total": total,
+        "status_url": f"/batches/{batch_id}"
+    }
+
+@app.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str, db: AsyncSession = Depends(get_db)):
+    batch = await get_batch(db, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+# ============ BACKGROUND TASKS ============
+
+async def enqueue_task(db: AsyncSession, kind, payload, file_content=None, filename=None):
+    try:
+        task = await task_queue.enqueue(db, kind, payload, file_content, filename)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(
+        status_code=202,
+        content={"task_id": task.id, "status": task.status, "status_url": f"/tasks/{task.id}"}
+    )
+
+@app.get("/tasks/{task_id}")
+async def get_task(task_id: str, db: AsyncSession = Depends(get_db)):
+    task = await task_queue.get(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return serialize_task(task)
+
 # ============ ADMIN LOGS ============
 
-@app.get("/admin/logs")
-async def get_admin_logs(created_by: str= Query(...), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Job).where(Job.created_by == created_by))
-    job_ids = [job.id for job in result.scalars().all()]
-    if not job_ids:
-        return []
+ADMIN_LOG_COLUMNS = (
+    ResumeLog.id,
+    ResumeLog.name,
+    ResumeLog.email,
+    ResumeLog.role,
+    ResumeLog.experience_level,
+    ResumeLog.final_score,
+    ResumeLog.score_source,
+    ResumeLog.status,
+    ResumeLog.timestamp,
+    Job.title.label("job_title"),
+    ResumeLog.job_id,
+)
+# Paged listings over at most this many jobs are merged from per-job index walks (see admin_logs_page_query)
+ADMIN_LOGS_MERGE_MAX_JOBS = int(os.getenv("ADMIN_LOGS_MERGE_MAX_JOBS", "200"))
 
-    result = await db.execute(
-        select(ResumeLog).where(ResumeLog.job_id.in_(job_ids)).options(joinedload(ResumeLog.job))
+def encode_log_cursor(timestamp, log_id):
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, log_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor):
+    try:
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.datetime.fromisoformat(timestamp) if timestamp else None), int(log_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def serialize_log_row(row):
+    log = dict(row._mapping)
+    log.pop("id")
+    return log
+
+def admin_logs_filters(status=None, level=None, min_score=None, max_score=None, cursor=None):
+    filters = []
+    if status:
+        filters.append(ResumeLog.status == status.upper())
+    if level:
+        filters.append(ResumeLog.experience_level == level.lower())
+    if min_score is not None:
+        filters.append(ResumeLog.final_score >= min_score)
+    if max_score is not None:
+        filters.append(ResumeLog.final_score <= max_score)
+    if cursor:
+        cursor_ts, cursor_id = decode_log_cursor(cursor)
+        filters.append(or_(
+            ResumeLog.timestamp < cursor_ts,
+            and_(ResumeLog.timestamp == cursor_ts, ResumeLog.id < cursor_id)
+        ))
+    return filters
+
+def admin_logs_query(created_by, job_id=None, status=None, level=None, min_score=None, max_score=None, cursor=None):
+    # One joined query over only the columns the dashboard shows, newest first; (timestamp, id) is the keyset
+    stmt = (
+        select(*ADMIN_LOG_COLUMNS)
+        .join(Job, ResumeLog.job_id == Job.id)
+        .where(Job.created_by == created_by, *admin_logs_filters(status, level, min_score, max_score, cursor))
     )
-    logs = result.scalars().all()
-
-    return [
-        {
-            "name": log.name,
-            "email": log.email,
-            "role": log.role,
-            "experience_level": log.experience_level,
-            "final_score": log.final_score,
-            "status": log.status,
-            "timestamp": log.timestamp,
-            "job_title": log.job.title if log.job else "—",
-            "job_id": log.job_id
-        }
-        for log in logs
+    if job_id is not None:
+        stmt = stmt.where(ResumeLog.job_id == job_id)
+    return stmt.order_by(ResumeLog.timestamp.desc(), ResumeLog.id.desc())
+
+def admin_logs_page_query(job_ids, limit, status=None, level=None, min_score=None, max_score=None, cursor=None):
+    # One page across several jobs. Joining on created_by makes the database sort every row the admin has;
+    # instead each job's newest `limit` rows come straight off ix_resume_logs_job_timestamp and only those
+    # (at most jobs x limit rows) are merged
+    filters = admin_logs_filters(status, level, min_score, max_score, cursor)
+    branches = [
+        select(
+            select(*ADMIN_LOG_COLUMNS)
+            .join(Job, ResumeLog.job_id == Job.id)
+            .where(ResumeLog.job_id == job_id, *filters)
+            .order_by(ResumeLog.timestamp.desc(), ResumeLog.id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        for job_id in job_ids
     ]
+    merged = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+    return select(merged).order_by(merged.c.timestamp.desc(), merged.c.id.desc()).limit(limit)
+
+@app.get("/admin/jobs/stats")
+async def get_admin_job_stats(
+    created_by: str = Query(...),
+    job_id: int | None = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    # Per-job counts, accept/reject, score histogram and level breakdown, kept up to date on every log write
+    return await job_stats_for_admin(db, created_by, job_id)
+
+@app.get("/admin/jobs/{job_id}/duplicates")
+async def get_job_duplicates(job_id: int, created_by: str = Query(...), db: AsyncSession = Depends(get_db)):
+    # Near-duplicate resume clusters touching this job (edited copies across jobs, repeated submissions)
+    job = await db.get(Job, job_id)
+    if not job or job.created_by != created_by:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=jsonable_encoder({
+        "job_id": job_id,
+        "clusters": await duplicate_index.clusters_for_job(db, job_id, created_by),
+    }))
+
+@app.get("/admin/search")
+async def search_candidates(
+    created_by: str = Query(...),
+    q: str = Query(..., min_length=1, max_length=200),
+    job_id: int | None = Query(None),
+    status: str | None = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    # Full-text search over resume text, matched skills, name and email (FTS5 / tsvector), best match first
+    hits, next_offset = await search_resumes(db, created_by, q, job_id, status, limit, offset)
+    headers = {"X-Next-Offset": str(next_offset)} if next_offset is not None else {}
+    return JSONResponse(content=jsonable_encoder(hits), headers=headers)
+
+@app.post("/admin/search/reindex")
+async def reindex_search(
+    created_by: str = Query(...),
+    limit: int = Query(500, ge=1, le=5000),
+    after_id: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    # Indexes applications stored before search existed; call again with after_id=next_after_id until it is null
+    return await reindex_missing(db, created_by, limit, after_id)
+
+@app.get("/admin/logs")
+async def get_admin_logs(
+    created_by: str= Query(...),
+    job_id: int | None = Query(None),
+    status: str | None = Query(None),
+    level: str | None = Query(None),
+    min_score: float | None = Query(None),
+    max_score: float | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=1000),  # omit for every row
+    cursor: str | None = Query(None),  # from the X-Next-Cursor header of the previous page
+    format: str = Query("json"),  # "json" | "ndjson"
+    db: AsyncSession = Depends(get_db)
+):
+    stmt = admin_logs_query(created_by, job_id, status, level, min_score, max_score, cursor)
+    # A page over several jobs is merged from per-job index walks instead of sorting everything
+    page_size = (limit if format == "ndjson" else limit + 1) if limit else None
+    if page_size and job_id is None:
+        job_ids = (await db.execute(select(Job.id).where(Job.created_by == created_by))).scalars().all()
+        if not job_ids:
+            stmt = None
+        elif len(job_ids) <= ADMIN_LOGS_MERGE_MAX_JOBS:
+            stmt = admin_logs_page_query(job_ids, page_size, status, level, min_score, max_score, cursor)
+
+    if format == "ndjson":
+        if stmt is None:
+            return StreamingResponse(iter(()), media_type="application/x-ndjson")
+        if limit:
+            stmt = stmt.limit(limit)
+
+        async def stream_rows():
+            # Own session: the request session is closed before a streaming body is sent.
+            # stream() uses a server-side cursor, so memory stays flat regardless of row count.
+            async with async_session() as session:
+                result = await session.stream(stmt.execution_options(yield_per=500))
+                async for row in result:
+                    yield json.dumps(serialize_log_row(row), default=str) + "\n"
+
+        return StreamingResponse(stream_rows(), media_type="application/x-ndjson")
+
+    if stmt is None:
+        return JSONResponse(content=[])
+    if limit:
+        stmt = stmt.limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+
+    headers = {}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_log_cursor(rows[-1].timestamp, rows[-1].id)
+
+    return JSONResponse(
+        content=jsonable_encoder([serialize_log_row(row) for row in rows]),
+        headers=headers
+    )
 
 
 
@@ -310,71 +491,148 @@ async def send_email(req: EmailRequest, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Application or Job not found")
 
     company = log.job.company_name or "our company"
-
-    if req.status.lower() == "accepted":
-        body = f"""
-Dear {req.name},
-
-Thank you for applying to the {req.best_role} position at {company}.
-
-You have been shortlisted for the next stage of our recruitment process. We’ll contact you soon!
-
-Warm regards,  
-HR Team  
-"""
-    else:
-        body = f"""
-Dear {req.name},
-
-Thank you for your interest in the {req.best_role} position at {company}.
-
-We regret to inform you that we will not be moving forward with your application at this time.
-
-We wish you all the best in your job search.
-
-Sincerely,  
-HR Team  
-"""
-
-    msg = MIMEText(body)
-    msg["Subject"] = f"Application Status – {req.best_role} at {company}"
-    msg["From"] = sender_email
-    msg["To"] = req.email
+    msg = build_status_email(sender_email, req.email, req.name, req.status, req.best_role, company)
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, req.email, msg.as_string())
+        # Reuses the sender's authenticated session; smtplib runs off the event loop
+        settings = await smtp_settings_for(db, sender_email, sender_password)
+        await smtp_pools.send(settings, msg)
         return {"message": "Email sent"}
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/send-email/bulk")
+async def send_email_bulk(req: BulkEmailRequest, db: AsyncSession = Depends(get_db)):
+    if not req.recipients:
+        raise HTTPException(status_code=400, detail="No recipients")
+    if len(req.recipients) > EMAIL_BULK_MAX_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {EMAIL_BULK_MAX_RECIPIENTS} recipients per request")
+
+    # One query for every application being notified
+    job_ids = {r.job_id for r in req.recipients}
+    emails = {r.email for r in req.recipients}
+    result = await db.execute(
+        select(ResumeLog.email, ResumeLog.job_id, Job.company_name)
+        .join(Job, ResumeLog.job_id == Job.id)
+        .where(ResumeLog.job_id.in_(job_ids), ResumeLog.email.in_(emails))
+    )
+    companies = {(email, job_id): company for email, job_id, company in result.all()}
+
+    messages = []
+    for r in req.recipients:
+        if (r.email, r.job_id) not in companies:
+            messages.append((r.email, "Application or Job not found"))
+            continue
+        company = companies[(r.email, r.job_id)] or "our company"
+        messages.append((r.email, build_status_email(req.sender_email, r.email, r.name, r.status, r.best_role, company)))
+
+    settings = await smtp_settings_for(db, req.sender_email, req.sender_password)
+    results = await smtp_pools.send_bulk(settings, messages)
+    sent = sum(1 for r in results if r["status"] == "sent")
+    return {"sent": sent, "failed": len(results) - sent, "results": results}
+
+@app.put("/admin/smtp-config", response_model=AdminConfigOut)
+async def save_smtp_config(config: AdminConfigCreate, created_by: str = Query(...), db: AsyncSession = Depends(get_db)):
+    # Replacing a config takes its owner and the password stored with it
+    row = await db.get(AdminConfig, config.email)
+    if row is None:
+        row = AdminConfig(email=config.email)
+        db.add(row)
+    elif (row.created_by is not None and row.created_by != created_by) or not smtp_password_matches(row, config.current_password):
+        raise HTTPException(status_code=403, detail="Not allowed to change this SMTP config")
+    for key, value in config.dict(exclude={"current_password"}).items():
+        setattr(row, key, value)
+    row.created_by = created_by
+    await db.commit()
+    return row
+
+@app.get("/admin/smtp-config/{email}", response_model=AdminConfigOut)
+async def get_smtp_config(email: str, created_by: str = Query(...), db: AsyncSession = Depends(get_db)):
+    row = await db.get(AdminConfig, email)
+    if not row or row.created_by != created_by:
+        raise HTTPException(status_code=404, detail="SMTP config not found")
+    return row
+
 
 
 
 
 # ============ RESUME FILE VIEW & DELETE ============
 
+RESUME_MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
 @app.get("/resumes/{email}")
-def view_resume(email: str):
+async def view_resume(request: Request, email: str, job_id: int = Query(None), db: AsyncSession = Depends(get_db)):
+    # One indexed lookup: (job_id, email) when the job is known, else the candidate's latest upload
+    query = select(ResumeFile).where(ResumeFile.email == email)
+    if job_id is not None:
+        query = query.where(ResumeFile.job_id == job_id)
+    entry = (await db.execute(query.order_by(ResumeFile.created_at.desc()).limit(1))).scalars().first()
+    if entry:
+        path = resume_store.path_for(entry.sha256, entry.ext)
+        if os.path.exists(path):
+            # Content-addressed, so the hash is a strong ETag
+            return file_response(
+                request, path, entry.size, RESUME_MEDIA_TYPES.get(entry.ext), f'"{entry.sha256}"',
+                entry.created_at, f"{email}.{entry.ext}"
+            )
+        raise HTTPException(status_code=404, detail="Resume not found.")
+
+    # Files saved before the resume store
     folder = "uploaded_resumes"
     safe_email = email.replace("/", "_").replace("\\", "_")
     for ext in [".pdf", ".docx"]:
         resume_path = os.path.join(folder, f"{safe_email}{ext}")
         if os.path.exists(resume_path):
-            media_type = "application/pdf" if ext == ".pdf" else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            return FileResponse(path=resume_path, media_type=media_type, filename=f"{safe_email}{ext}")
+            return FileResponse(path=resume_path, media_type=RESUME_MEDIA_TYPES[ext[1:]], filename=f"{safe_email}{ext}")
     raise HTTPException(status_code=404, detail="Resume not found.")
 
+# ============ CACHE STATS ============
+
+@app.get("/admin/cache/stats")
+async def get_cache_stats():
+    return {
+        "extraction": extraction_service.stats(),
+        "llm": await llm_cache.stats(),
+        "active_jobs": active_jobs_cache.stats(),
+        "near_duplicates": duplicate_index.stats()
+    }
+
+# ============ METRICS ============
+
+def cache_hit_ratio(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+registry.gauge(
+    "cache_hit_ratio", "Hit ratio since process start", lambda: {
+        "extraction": cache_hit_ratio(extraction_service.hits, extraction_service.misses),
+        "llm": cache_hit_ratio(llm_cache.hits, llm_cache.misses),
+        "active_jobs": cache_hit_ratio(active_jobs_cache.hits, active_jobs_cache.misses),
+    }, labelname="cache"
+)
+registry.gauge("llm_circuit_open", "1 while the LLM circuit breaker rejects calls", lambda: int(llm_client.breaker.state == "open"))
+registry.gauge("task_queue_depth", "Unfinished screening tasks by status", task_queue.depth, labelname="status")
+registry.gauge("write_buffer_pending_rows", "Results waiting for the next group commit", lambda: result_write_buffer.stats()["pending"])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(await registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/write_buffer/stats")
+async def get_write_buffer_stats():
+    return result_write_buffer.stats()
+
 @app.delete("/logs/{email}/{job_id}")
 async def delete_resume_log(email: str, job_id: int, db: AsyncSession = Depends(get_db)):
-    await db.execute(delete(ResumeLog).where(
-        ResumeLog.email == email,
-        ResumeLog.job_id == job_id
-    ))
+    released_blobs = await delete_application(db, job_id, email)
     await db.commit()
+    await discard_unreferenced_blobs(db, released_blobs)
     return {"message": "Deleted"}
 
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,258 @@
+import asyncio
+import bisect
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Per-request profiling is only possible when this token is set; send it as the X-Profile header
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage durations of the request being handled, for the Server-Timing header
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _label_str(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    # Read at scrape time from a callback returning a number or {label value: number}
+    def __init__(self, name, help, callback, labelname=None):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelname = labelname
+
+    async def render(self):
+        value = self.callback()
+        if asyncio.iscoroutine(value):
+            value = await value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if isinstance(value, dict):
+            for label, v in sorted(value.items()):
+                lines.append(f"{self.name}{_label_str((self.labelname,), (label,))} {v}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, callback, labelname=None):
+        self._gauges.append(Gauge(name, help, callback, labelname))
+
+    async def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for gauge in self._gauges:
+            try:
+                lines += await gauge.render()
+            except Exception as e:
+                # One broken source (e.g. DB down) must not take the whole scrape with it
+                print(f"⚠️ Metric {gauge.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "resume_stage_duration_seconds", "Time spent in each screening/analysis stage", ["stage"]
+)
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+LLM_CALLS = registry.counter(
+    "llm_calls_total", "Calls that reached the LLM, by model and outcome", ["model", "outcome"]
+)
+NEAR_DUPLICATES = registry.counter(
+    "resume_near_duplicates_total", "Screened resumes that matched an earlier one, same job or another", ["scope"]
+)
+RESUME_PROMPT_TOKENS = registry.counter(
+    "resume_prompt_tokens_total", "Estimated resume tokens before compaction and actually sent, by prompt", ["prompt", "kind"]
+)
+
+
+def record_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(stage):
+    # Works around sync and async code alike: `with timed_stage("extract"): await ...`
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def server_timing_header(timings, total):
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class RequestProfiler:
+    # pyinstrument (sampling) when installed, else cProfile; output goes to PROFILE_DIR
+
+    def __init__(self, label):
+        self.label = label
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler(async_mode="enabled")
+            self._kind = "pyinstrument"
+        except ImportError:
+            self._profiler = cProfile.Profile()
+            self._kind = "cprofile"
+
+    def start(self):
+        self._profiler.enable() if self._kind == "cprofile" else self._profiler.start()
+
+    def stop(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label}"
+        if self._kind == "pyinstrument":
+            self._profiler.stop()
+            path = os.path.join(PROFILE_DIR, f"{name}.html")
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+        else:
+            # cProfile sees everything on the event loop thread while enabled, not only this request
+            self._profiler.disable()
+            path = os.path.join(PROFILE_DIR, f"{name}.txt")
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            with open(path, "w") as f:
+                f.write(out.getvalue())
+        return path
+
+
+class TimingMiddleware:
+    # Pure ASGI: records request latency, adds Server-Timing, and profiles requests carrying X-Profile
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        profiler = None
+        headers = dict(scope.get("headers") or [])
+        if PROFILE_TOKEN and headers.get(b"x-profile", b"").decode() == PROFILE_TOKEN:
+            label = scope["path"].strip("/").replace("/", "_") or "root"
+            profiler = RequestProfiler(label)
+            profiler.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                extra = [(b"server-timing", server_timing_header(timings, time.perf_counter() - started).encode())]
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
+            if profiler is not None:
+                print(f"🔬 Profile written to {profiler.stop()}")
+            request_timings.reset(token)
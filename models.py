@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -16,10 +16,104 @@ class ResumeLog(Base):
     experience_level = Column(String, nullable=True)    
     final_score = Column(Float, nullable=True)
     status = Column(String, nullable=True)
+    score_source = Column(String, nullable=True)  # "llm" | "llm_cheap" | "prescreen" | "duplicate"
     
     job_id = Column(Integer, ForeignKey("jobs.id"))
     job = relationship("Job", backref="resumes")
 
+    __table_args__ = (
+        # One application per candidate per job; target of the ON CONFLICT upsert
+        Index("uq_resume_logs_job_email", "job_id", "email", unique=True),
+        # /admin/logs: per-job listing newest first, and status / score filters
+        Index("ix_resume_logs_job_timestamp", "job_id", "timestamp", "id"),
+        Index("ix_resume_logs_job_status_score", "job_id", "status", "final_score"),
+    )
+
+# ==================== ResumeFile Model ====================
+
+class ResumeFile(Base):
+    # (job_id, email) -> content-addressed blob in the resume store; one blob can back many applications
+    __tablename__ = "resume_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    email = Column(String, nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    ext = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    filename = Column(String, nullable=True)  # as uploaded
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_resume_files_job_email", "job_id", "email", unique=True),
+        # GET /resumes/{email} without a job: latest upload first
+        Index("ix_resume_files_email_created", "email", "created_at"),
+    )
+
+# ==================== Job Stats Model ====================
+
+class JobStats(Base):
+    # Running aggregates over a job's resume_logs, changed in the same transaction as each log write/delete
+    __tablename__ = "job_stats"
+
+    job_id = Column(Integer, ForeignKey("jobs.id"), primary_key=True)
+    applications = Column(Integer, nullable=False, default=0)
+    accepted = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    level_junior = Column(Integer, nullable=False, default=0)
+    level_mid = Column(Integer, nullable=False, default=0)
+    level_senior = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    # final_score histogram: score_N counts scores in [N/10, (N+1)/10), score_9 includes 1.0
+    score_0 = Column(Integer, nullable=False, default=0)
+    score_1 = Column(Integer, nullable=False, default=0)
+    score_2 = Column(Integer, nullable=False, default=0)
+    score_3 = Column(Integer, nullable=False, default=0)
+    score_4 = Column(Integer, nullable=False, default=0)
+    score_5 = Column(Integer, nullable=False, default=0)
+    score_6 = Column(Integer, nullable=False, default=0)
+    score_7 = Column(Integer, nullable=False, default=0)
+    score_8 = Column(Integer, nullable=False, default=0)
+    score_9 = Column(Integer, nullable=False, default=0)
+    last_application_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ==================== Resume Signature Models ====================
+
+class ResumeSignature(Base):
+    # MinHash of a screened resume's text, one per application; near-duplicates share a cluster
+    __tablename__ = "resume_signatures"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    email = Column(String, nullable=False)
+    sha256 = Column(String(64), nullable=True)  # stored upload
+    signature = Column(LargeBinary, nullable=False)  # uint32 minimum per permutation
+    llm_score = Column(Float, nullable=True)  # reused for near-duplicates on the same job
+    job_source_hash = Column(String(64), nullable=True)  # job artifacts' source_hash the score was computed against
+    # Id of the first signature in this resume's cluster (itself when it started one); not a foreign key,
+    # so deleting the first application keeps the rest of the cluster together
+    cluster_id = Column(Integer, nullable=True, index=True)
+    similarity = Column(Float, nullable=True)  # estimated Jaccard similarity to the match that put it in the cluster
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_resume_signatures_job_email", "job_id", "email", unique=True),
+    )
+
+
+class ResumeSignatureBand(Base):
+    # LSH buckets: signatures sharing any (band, bucket) pair are near-duplicate candidates
+    __tablename__ = "resume_signature_bands"
+
+    signature_id = Column(Integer, ForeignKey("resume_signatures.id"), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    bucket = Column(String(16), nullable=False)
+
+    __table_args__ = (
+        Index("ix_resume_signature_bands_band_bucket", "band", "bucket"),
+    )
+
 # ==================== Job Model ====================
 
 class Job(Base):
@@ -30,13 +124,65 @@ class Job(Base):
     description = Column(String)
     department = Column(String)
     location = Column(String)
-    deadline = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     required_skills = Column(String)
     company_name = Column(String, nullable=False, default="Not mentioned")
     
     # ✅ NEW FIELD TO ENABLE MULTI-ADMIN SUPPORT
-    created_by = Column(String, nullable=False)  # Admin UID
+    created_by = Column(String, nullable=False, index=True)  # Admin UID
+
+# ==================== Job Artifact Model ====================
+
+class JobArtifact(Base):
+    __tablename__ = "job_artifacts"
+
+    # Precomputed job-side screening inputs, rebuilt only when the job changes
+    job_id = Column(Integer, ForeignKey("jobs.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)  # bumped on every rebuild
+    schema_version = Column(Integer, nullable=False)
+    source_hash = Column(String(64), nullable=False)  # hash of title/description/required_skills
+    skills = Column(Text, nullable=False)  # JSON list of normalized skills
+    skills_source = Column(String, nullable=False)  # "admin" | "llm" | "role_default"
+    term_vector = Column(Text, nullable=False)  # JSON {"indices": [...], "counts": [...]}
+    prompt_prefix = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ==================== Screening Task Model ====================
+
+class ScreeningTask(Base):
+    __tablename__ = "screening_tasks"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String, nullable=False)  # "screen" | "analyze"
+    status = Column(String, nullable=False, default="pending", index=True)  # pending/running/done/failed
+    batch_id = Column(String(32), nullable=True, index=True)
+    payload = Column(Text, nullable=False)  # JSON arguments for the handler
+    file_path = Column(String, nullable=True)  # spooled upload
+    result = Column(Text, nullable=True)  # JSON handler result
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)  # retry backoff
+    lease_owner = Column(String(32), nullable=True, index=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ==================== LLM Cache Model ====================
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    # sha256 of (resume hash, job hash, prompt version, model name)
+    key = Column(String(64), primary_key=True)
+    model_name = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    response_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+    hit_count = Column(Integer, nullable=False, default=0)
 
 
 from sqlalchemy import Column, String
@@ -50,3 +196,5 @@ class AdminConfig(Base):
     smtp_port = Column(String, nullable=False)
     smtp_username = Column(String, nullable=False)
     smtp_password = Column(String, nullable=False)  # You may encrypt this later
+    # Admin who saved the row; only they can read or change it (NULL for rows saved before this existed)
+    created_by = Column(String, nullable=True, index=True)
@@ -0,0 +1,250 @@
+import datetime
+import hashlib
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+from sqlalchemy import select, delete, update, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from metrics import NEAR_DUPLICATES
+from models import Job, ResumeSignature, ResumeSignatureBand
+
+
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() not in ("0", "false", "no")
+# Estimated Jaccard similarity (over 5-word shingles) from which two resumes count as the same one
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+# A near-duplicate of an earlier application to the same job gets its LLM score instead of a new Gemini call
+NEAR_DUPLICATE_REUSE_SCORE = os.getenv("NEAR_DUPLICATE_REUSE_SCORE", "true").lower() not in ("0", "false", "no")
+# Signatures compared per lookup; more than this sharing a bucket means a flood of copies, any of them will do
+NEAR_DUPLICATE_MAX_CANDIDATES = int(os.getenv("NEAR_DUPLICATE_MAX_CANDIDATES", "50"))
+
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs at 0.8 similarity share a bucket ~95% of the time, at 0.9 almost always, at 0.5 ~6%
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+# Shingles hashed per numpy pass, to bound memory on very long resumes
+SIGNATURE_CHUNK = 4096
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Fixed seed: signatures are stored and compared across processes and restarts
+_permutations = np.random.RandomState(1)
+PERM_A = _permutations.randint(1, (1 << 61) - 1, MINHASH_PERMUTATIONS, dtype=np.uint64)
+PERM_B = _permutations.randint(0, (1 << 61) - 1, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text):
+    words = WORD_RE.findall((text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    size = min(SHINGLE_WORDS, len(words))
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(text):
+    # uint32 array of MINHASH_PERMUTATIONS minima, or None for a resume without text
+    hashes = shingle_hashes(text)
+    if not hashes.size:
+        return None
+    signature = np.full(MINHASH_PERMUTATIONS, MAX_HASH, dtype=np.uint64)
+    for start in range(0, hashes.size, SIGNATURE_CHUNK):
+        chunk = hashes[start:start + SIGNATURE_CHUNK]
+        # (a*x + b) mod p per permutation; uint64 wrap-around is part of the hash family
+        values = (PERM_A[:, None] * chunk[None, :] + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+        signature = np.minimum(signature, values.min(axis=1))
+    return signature.astype(np.uint32)
+
+
+def band_buckets(signature):
+    return [
+        (band, hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest())
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimated_similarity(a, b):
+    # Share of equal minima estimates the Jaccard similarity of the shingle sets
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    # MinHash signatures with an LSH band index in the shared database: a lookup reads LSH_BANDS index
+    # entries and a handful of candidate signatures instead of comparing against every resume
+
+    def __init__(self, enabled=NEAR_DUPLICATE_ENABLED, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.enabled = enabled
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    async def find(self, signature, job_id, email=None, job_source_hash=None):
+        # Best earlier resume at or above the threshold, preferring the same job; the application's own
+        # earlier version (same job and email) is skipped so an edited re-upload is scored afresh.
+        # `score_reusable` is set only for a same-job match scored against the job as it is now
+        # (`job_source_hash`) and outside the cluster of the application's own earlier version, so a
+        # re-screen never gets back a score that was copied from its own previous one.
+        if not self.enabled or signature is None:
+            return None
+        self._count("lookups")
+        buckets = band_buckets(signature)
+        async with async_session() as db:
+            own_cluster_id = (await db.execute(
+                select(ResumeSignature.cluster_id)
+                .where(ResumeSignature.job_id == job_id, ResumeSignature.email == email)
+            )).scalar_one_or_none() if email else None
+            candidate_ids = (await db.execute(
+                select(ResumeSignatureBand.signature_id)
+                .where(or_(*(
+                    and_(ResumeSignatureBand.band == band, ResumeSignatureBand.bucket == bucket)
+                    for band, bucket in buckets
+                )))
+                .distinct()
+                .limit(NEAR_DUPLICATE_MAX_CANDIDATES)
+            )).scalars().all()
+            if not candidate_ids:
+                return None
+            candidates = (await db.execute(
+                select(
+                    ResumeSignature.id, ResumeSignature.job_id, ResumeSignature.email, ResumeSignature.signature,
+                    ResumeSignature.llm_score, ResumeSignature.job_source_hash, ResumeSignature.cluster_id,
+                ).where(ResumeSignature.id.in_(candidate_ids))
+            )).all()
+
+        best = None
+        for candidate in candidates:
+            if candidate.job_id == job_id and candidate.email == email:
+                continue
+            other = np.frombuffer(candidate.signature, dtype=np.uint32)
+            if other.shape != signature.shape:
+                continue
+            similarity = estimated_similarity(signature, other)
+            if similarity < self.threshold:
+                continue
+            same_job = candidate.job_id == job_id
+            reusable = (
+                same_job
+                and candidate.llm_score is not None
+                and job_source_hash is not None
+                and candidate.job_source_hash == job_source_hash
+                and (own_cluster_id is None or candidate.cluster_id != own_cluster_id)
+            )
+            rank = (same_job, reusable, similarity)
+            if best is None or rank > best[0]:
+                best = (rank, candidate, similarity)
+        if best is None:
+            return None
+
+        (same_job, reusable, _), candidate, similarity = best
+        self._count("matches")
+        NEAR_DUPLICATES.inc(scope="same_job" if same_job else "other_job")
+        return {
+            "signature_id": candidate.id,
+            "cluster_id": candidate.cluster_id or candidate.id,
+            "job_id": candidate.job_id,
+            "email": candidate.email,
+            "similarity": round(similarity, 4),
+            "llm_score": candidate.llm_score,
+            "same_job": same_job,
+            "score_reusable": reusable,
+        }
+
+    async def add(self, job_id, email, sha256, signature, llm_score=None, match=None, job_source_hash=None):
+        # Stores (or replaces) the application's signature and LSH buckets; joins `match`'s cluster if given
+        if not self.enabled or signature is None or not email:
+            return
+        values = {
+            "job_id": job_id,
+            "email": email,
+            "sha256": sha256,
+            "signature": signature.tobytes(),
+            "llm_score": llm_score,
+            "job_source_hash": job_source_hash,
+            "cluster_id": match["cluster_id"] if match else None,
+            "similarity": match["similarity"] if match else None,
+            "created_at": datetime.datetime.utcnow(),
+        }
+        async with async_session() as db:
+            insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+            stmt = insert(ResumeSignature).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ResumeSignature.job_id, ResumeSignature.email],
+                set_={column: stmt.excluded[column] for column in values if column not in ("job_id", "email")}
+            ).returning(ResumeSignature.id)
+            signature_id = (await db.execute(stmt)).scalar_one()
+            if match is None:
+                # First of its kind: it starts its own cluster
+                await db.execute(
+                    update(ResumeSignature).where(ResumeSignature.id == signature_id).values(cluster_id=signature_id)
+                )
+            await db.execute(delete(ResumeSignatureBand).where(ResumeSignatureBand.signature_id == signature_id))
+            await db.execute(ResumeSignatureBand.__table__.insert(), [
+                {"signature_id": signature_id, "band": band, "bucket": bucket} for band, bucket in band_buckets(signature)
+            ])
+            await db.commit()
+
+    async def _delete_where(self, db: AsyncSession, condition):
+        ids = select(ResumeSignature.id).where(condition)
+        await db.execute(delete(ResumeSignatureBand).where(ResumeSignatureBand.signature_id.in_(ids)))
+        await db.execute(delete(ResumeSignature).where(condition))
+
+    async def delete(self, db: AsyncSession, job_id, email):
+        # Caller commits together with the application delete
+        await self._delete_where(db, and_(ResumeSignature.job_id == job_id, ResumeSignature.email == email))
+
+    async def delete_job(self, db: AsyncSession, job_id):
+        # Caller commits together with the job delete
+        await self._delete_where(db, ResumeSignature.job_id == job_id)
+
+    async def clusters_for_job(self, db: AsyncSession, job_id, created_by):
+        # Clusters with at least two applications, one of them to this job; only the admin's own jobs are listed
+        cluster_ids = select(ResumeSignature.cluster_id).where(ResumeSignature.job_id == job_id)
+        rows = (await db.execute(
+            select(
+                ResumeSignature.cluster_id, ResumeSignature.job_id, Job.title, ResumeSignature.email,
+                ResumeSignature.similarity, ResumeSignature.created_at,
+            )
+            .join(Job, Job.id == ResumeSignature.job_id)
+            .where(ResumeSignature.cluster_id.in_(cluster_ids), Job.created_by == created_by)
+            .order_by(ResumeSignature.cluster_id, ResumeSignature.created_at)
+        )).all()
+
+        clusters = {}
+        for cluster_id, member_job_id, title, email, similarity, created_at in rows:
+            clusters.setdefault(cluster_id, []).append({
+                "job_id": member_job_id,
+                "job_title": title,
+                "email": email,
+                "similarity": similarity,
+                "created_at": created_at,
+            })
+        result = [
+            {"cluster_id": cluster_id, "size": len(members), "members": members}
+            for cluster_id, members in clusters.items() if len(members) > 1
+        ]
+        return sorted(result, key=lambda cluster: -cluster["size"])
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+
+duplicate_index = DuplicateIndex()
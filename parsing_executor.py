@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# Worker processes used for PDF/DOCX parsing (0 = run in a thread instead)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+# Hard deadline for parsing a single document
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "30"))
+
+
+class ParseWorkerError(Exception):
+    pass
+
+
+def _alarm_handler(signum, frame):
+    raise ParseWorkerError("Document parsing timed out")
+
+
+def _run_with_deadline(fn, timeout, *args):
+    # Runs inside the worker process; SIGALRM interrupts a parser stuck on a pathological file
+    # so the worker is free again instead of staying busy after the caller gave up
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _alarm_handler)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+class ParsingExecutor:
+    # Process pool for CPU-heavy document parsing, started and stopped with the app
+
+    def __init__(self, workers=PARSE_WORKERS, timeout=PARSE_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+
+    def start(self):
+        if self.workers > 0 and self._pool is None:
+            # spawn: children must not inherit the event loop / DB connections of the server process
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def _restart(self, pool):
+        # Only the pool the failed call ran on; a second caller failing on the same old pool must not
+        # replace the fresh one
+        if self._pool is not pool:
+            return
+        # shutdown() does not stop a running worker, so a parser stuck past its alarm would keep its
+        # process alive; kill the old pool's workers before replacing it
+        processes = list((pool._processes or {}).values())
+        self.shutdown(wait=False)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        self.start()
+
+    async def run(self, fn, *args):
+        # `fn` must be a picklable module-level function
+        if self.workers <= 0:
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise ParseWorkerError(f"Document parsing timed out after {self.timeout:g}s")
+
+        if self._pool is None:
+            self.start()
+        pool = self._pool
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(pool, _run_with_deadline, fn, self.timeout, *args)
+        try:
+            # Small grace period on top of the in-worker alarm
+            return await asyncio.wait_for(future, timeout=self.timeout + 5)
+        except asyncio.TimeoutError:
+            # The worker did not honour its alarm; replace the pool rather than leave it wedged
+            self._restart(pool)
+            raise ParseWorkerError(f"Document parsing timed out after {self.timeout:g}s")
+        except BrokenProcessPool:
+            # A worker crashed (e.g. segfault in a native parser); recycle the pool for the next request
+            self._restart(pool)
+            raise ParseWorkerError("Document parser crashed")
+
+
+parsing_executor = ParsingExecutor()
@@ -0,0 +1,79 @@
+import json
+import os
+import re
+
+from blob_store import MAX_UPLOAD_BYTES
+
+
+# Multipart framing and form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = int(os.getenv("MULTIPART_OVERHEAD_BYTES", str(256 * 1024)))
+# Any request body, unless a path limit below says otherwise
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)))
+
+
+class RequestSizeLimitMiddleware:
+    # Pure ASGI: Starlette spools a multipart body to a temp file before the route runs, so the upload cap
+    # has to act on the body as it arrives. A declared Content-Length over the limit is refused without
+    # reading anything; a chunked or lying body is cut off once it crosses the limit. Either way: 413.
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES, path_limits=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        # (compiled path regex, limit) pairs, first match wins
+        self.path_limits = [(re.compile(pattern), limit) for pattern, limit in path_limits]
+
+    def limit_for(self, path):
+        for pattern, limit in self.path_limits:
+            if pattern.match(path):
+                return limit
+        return self.max_bytes
+
+    async def _reject(self, send, limit):
+        body = json.dumps({"detail": f"Request body exceeds {limit} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = self.limit_for(scope["path"])
+        headers = dict(scope.get("headers") or [])
+        try:
+            declared = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            declared = 0
+        if declared > limit:
+            return await self._reject(send, limit)
+
+        state = {"received": 0, "exceeded": False, "started": False}
+
+        async def limited_receive():
+            if state["exceeded"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    # The app sees a client disconnect and stops reading (and spooling)
+                    state["exceeded"] = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if state["exceeded"] and not state["started"]:
+                return  # the app's error response is replaced by the 413 below
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not state["exceeded"]:
+                raise
+        if state["exceeded"] and not state["started"]:
+            await self._reject(send, limit)
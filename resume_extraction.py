@@ -0,0 +1,228 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from metrics import timed_stage
+from parsing_executor import parsing_executor, ParseWorkerError
+
+
+# Max number of parsed resumes kept in memory
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "256"))
+# Optional second tier on disk (unset = memory only)
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR")
+# PDFs longer than this are only read up to this page
+PARSE_MAX_PAGES = int(os.getenv("PARSE_MAX_PAGES", "20"))
+
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+
+
+class ResumeParseError(Exception):
+    # Raised for corrupt, unreadable or too slow uploads
+    pass
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+
+
+# ============ RAW PARSERS ============
+
+# pdfplumber and python-docx are slow to import; they are loaded by the first parse (in the worker
+# process doing it) instead of when the app starts
+def pdf_library():
+    import pdfplumber
+    return pdfplumber
+
+
+def docx_library():
+    import docx
+    return docx
+
+
+def read_pdf(stream, max_pages=None):
+    with pdf_library().open(stream) as pdf:
+        # Only the first `max_pages` pages are read; the real page count is still reported
+        pages = pdf.pages[:max_pages] if max_pages else pdf.pages
+        texts = [page.extract_text() for page in pages]
+        return "\n".join(text for text in texts if text), len(pdf.pages)
+
+
+def read_docx(stream):
+    docx = docx_library()
+    doc = docx.Document(stream)
+    text = "\n".join(para.text for para in doc.paragraphs)
+    # DOCX has no fixed pagination; count explicit page breaks instead
+    breaks = sum(
+        1 for br in doc.element.body.iter(docx.oxml.ns.qn("w:br"))
+        if br.get(docx.oxml.ns.qn("w:type")) == "page"
+    )
+    return text, breaks + 1
+
+
+def extract_email(text):
+    match = EMAIL_RE.search(text or "")
+    return match.group(0) if match else None
+
+
+def extract_name(text):
+    # Basic name extraction: first non-empty short line
+    for line in (text or "").strip().splitlines():
+        line = line.strip()
+        if len(line) >= 2 and len(line.split()) <= 4:
+            return line
+    return "Candidate"
+
+
+def parse_bytes(data: bytes, ext: str, max_pages=PARSE_MAX_PAGES) -> dict:
+    return parse_stream(io.BytesIO(data), ext, max_pages)
+
+
+def parse_file(path: str, ext: str, max_pages=PARSE_MAX_PAGES) -> dict:
+    # Workers read stored resumes themselves, so the bytes never pass through the server process
+    with open(path, "rb") as f:
+        return parse_stream(f, ext, max_pages)
+
+
+def parse_stream(stream, ext: str, max_pages=PARSE_MAX_PAGES) -> dict:
+    try:
+        if ext == "pdf":
+            text, pages = read_pdf(stream, max_pages)
+        elif ext == "docx":
+            text, pages = read_docx(stream)
+        else:
+            text, pages = "", 0
+    except ResumeParseError:
+        raise
+    except Exception as e:
+        raise ResumeParseError(f"Could not read {ext.upper() or 'file'}: {e.__class__.__name__}: {e}")
+
+    return {
+        "text": text,
+        "name": extract_name(text),
+        "email": extract_email(text),
+        "pages": pages,
+    }
+
+
+# ============ EXTRACTION SERVICE ============
+
+class ExtractionService:
+    # Parses each distinct upload once; results are keyed by the SHA-256 of the bytes
+
+    def __init__(self, max_entries=EXTRACTION_CACHE_SIZE, cache_dir=EXTRACTION_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store_disk(self, key, result):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write extraction cache entry {key}: {e}")
+
+    def get(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+
+        result = self._load_disk(key)
+        if result is not None:
+            self.put(key, result, persist=False)
+            with self._lock:
+                self.hits += 1
+            return dict(result)
+        return None
+
+    def put(self, key, result, persist=True):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        if persist:
+            self._store_disk(key, result)
+
+    def extract(self, data: bytes, filename: str) -> dict:
+        key = content_hash(data)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        result = parse_bytes(data, file_extension(filename))
+        result["sha256"] = key
+        self.put(key, result)
+        return dict(result)
+
+    async def extract_async(self, data: bytes, filename: str) -> dict:
+        # Same as extract(), but cache misses are parsed in the parsing executor off the event loop
+        return await self._extract_async(content_hash(data), parse_bytes, data, file_extension(filename))
+
+    async def extract_path_async(self, path: str, sha256: str, filename: str) -> dict:
+        # For files already in the resume store, whose hash is known
+        return await self._extract_async(sha256, parse_file, path, file_extension(filename))
+
+    async def _extract_async(self, key, parse, source, ext):
+        with timed_stage("extract"):
+            return await self._extract_uncached(key, parse, source, ext)
+
+    async def _extract_uncached(self, key, parse, source, ext):
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        try:
+            result = await parsing_executor.run(parse, source, ext)
+        except ParseWorkerError as e:
+            raise ResumeParseError(str(e))
+        result["sha256"] = key
+        self.put(key, result)
+        return dict(result)
+
+    def extract_file(self, file_path: str) -> dict:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return self.extract(data, file_path)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+extraction_service = ExtractionService()
@@ -1,24 +1,56 @@
 
-import pdfplumber
-import docx
 import re
+import asyncio
+import json
+import zlib
+import numpy as np
 # from pyresparser import ResumeParser
 from datetime import datetime
 import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from google.generativeai import GenerativeModel, configure
 from dotenv import load_dotenv
-from models import ResumeLog
-from sqlalchemy.ext.asyncio import AsyncSession
+from resume_extraction import extraction_service, extract_email
+from llm_cache import llm_cache
+from skill_matcher import SkillMatcher, skill_matchers
+from metrics import timed_stage, RESUME_PROMPT_TOKENS
+from llm_client import llm_client, LLMError, LLM_CALL_TIMEOUT_SECONDS
 
 
 # Load environment variables
 load_dotenv()
-configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# Initialize Gemini model
-gemini = GenerativeModel("gemini-2.5-pro")
+# Gemini models; every call goes through the shared llm_client
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+
+# Prompt template versions; bump when a prompt changes so cached responses are not reused
+SCORE_PROMPT_VERSION = "score-v2"
+SKILLS_PROMPT_VERSION = "skills-v1"
+ANALYZE_PROMPT_VERSION = "analyze-v1"
+
+# Max concurrent Gemini calls per /analyze_resume request
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "4"))
+
+# Local pre-screening gate in front of the LLM
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "true").lower() not in ("0", "false", "no")
+# Resumes whose local score is below this never reach the main Gemini model
+PRESCREEN_CUTOFF = float(os.getenv("PRESCREEN_CUTOFF", "0.15"))
+# "cheap_model" = score with GEMINI_CHEAP_MODEL instead, "reject" = auto-reject on the local score (no LLM at all)
+PRESCREEN_MODE = os.getenv("PRESCREEN_MODE", "cheap_model")
+# Optional document-frequency snapshot (see TermStats.save); without one every term weighs the same
+PRESCREEN_TERM_STATS_PATH = os.getenv("PRESCREEN_TERM_STATS_PATH")
+# BM25 length normalisation when no snapshot supplies the corpus average (in tokens)
+PRESCREEN_AVG_DOC_LENGTH = float(os.getenv("PRESCREEN_AVG_DOC_LENGTH", "400"))
+GEMINI_CHEAP_MODEL_NAME = os.getenv("GEMINI_CHEAP_MODEL", "gemini-1.5-flash")
+
+BATCH_PROMPT_VERSION = "analyze-batch-v1"
+# Approximate input-token ceiling for one batched /analyze_resume prompt
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "24000"))
+
+# Resume text is normalized, stripped of page boilerplate and trimmed before it goes into a prompt
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() not in ("0", "false", "no")
+# Approximate tokens of resume text per prompt (see estimate_tokens)
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "1500"))
 
 # Role-specific required skills
 ROLE_SKILLS = {
@@ -29,25 +61,13 @@ ROLE_SKILLS = {
 
 # Extract text from resume
 def extract_text(file_path):
-    if file_path.endswith(".pdf"):
-        with pdfplumber.open(file_path) as pdf:
-            return "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
-    elif file_path.endswith(".docx"):
-        doc = docx.Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    else:
-        return ""
-
-# Extract email from resume
-def extract_email(text):
-    match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-    return match.group(0) if match else None
+    return extraction_service.extract_file(file_path)["text"]
 
 # Fallback skill extraction
-def extract_skills_fallback(text, known_skills: List[str]):
-    resume_words = set(re.findall(r'\b\w[\w+\.\#]*\b', text.lower()))
-    found = [skill for skill in known_skills if skill.lower() in resume_words]
-    return list(set(found))
+def extract_skills_fallback(text, known_skills: List[str], matcher=None):
+    # Multi-word/punctuated skills and synonyms are handled by the compiled matcher
+    matcher = matcher or SkillMatcher(known_skills)
+    return matcher.match(text)
 
 # Experience estimation
 def adjust_experience(exp_years, text):
@@ -73,37 +93,12 @@ def get_experience_level(exp_years):
 #         return ResumeParser(file_path).get_extracted_data()
 #     except:
 #         return {}
-import re
-import docx
-import pdfplumber
 
 def parse_resume(file_path):
-    # Extract raw text
-    text = ""
-    if file_path.endswith(".pdf"):
-        with pdfplumber.open(file_path) as pdf:
-            text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-    elif file_path.endswith(".docx"):
-        doc = docx.Document(file_path)
-        text = "\n".join(para.text for para in doc.paragraphs)
-
-    # Try basic name extraction: first non-empty short line
-    name = None
-    for line in text.strip().splitlines():
-        line = line.strip()
-        if line and len(line.split()) <= 4:
-            name = line
-            break
-    if not name:
-        name = "Candidate"
-
-    # Extract email
-    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-    email = email_match.group(0) if email_match else None
-
+    data = extraction_service.extract_file(file_path)
     return {
-        "name": name,
-        "email": email,
+        "name": data["name"],
+        "email": data["email"],
         "skills": [],  # You already have fallback skill extractor
         "total_experience": 0  # You already adjust and estimate this separately
     }
@@ -115,22 +110,41 @@ def compute_skill_match(resume_skills, required_skills):
     return len(matched) / len(required_skills) if required_skills else 0, list(matched)
 
 # Gemini LLM scoring
-def get_gemini_score(resume_text, job_title, job_description):
-    prompt = f"""
-    Given the following resume:
-    {resume_text}
-
-    Evaluate how well this resume matches the job titled '{job_title}' with the following description:
+# The job part comes first so it can be precomputed per job (see job_artifacts) and shared across resumes
+def build_score_prompt_prefix(job_title, job_description):
+    return f"""
+    Evaluate how well the resume below matches the job titled '{job_title}' with the following description:
     {job_description}
 
     Return only a numeric ATS score between 0 and 1, where 1 means a perfect match.
     """
-    try:
-        response = gemini.generate_content(prompt)
-        score = float(re.findall(r"\d+\.\d+", response.text)[0])
-        return min(max(score, 0), 1)
-    except:
-        return 0.5
+
+def parse_score(text):
+    # "0.82", "1", "82%" or "82/100" -> 0..1
+    match = re.search(r"\d+(?:\.\d+)?", text or "")
+    if not match:
+        raise LLMError(f"No score in LLM response: {(text or '')[:80]!r}")
+    score = float(match.group(0))
+    if score > 1:
+        score = score / 100
+    return min(max(score, 0), 1)
+
+async def get_gemini_score(resume_text, job_title, job_description, model_name=None, prompt_prefix=None):
+    resume_text = resume_for_prompt(resume_text, job_title, job_description, "score")
+    prompt = f"""{prompt_prefix or build_score_prompt_prefix(job_title, job_description)}
+    Resume:
+    {resume_text}
+    """
+    model_name = model_name or GEMINI_MODEL_NAME
+
+    async def generate():
+        return await llm_client.generate(prompt, model_name)
+
+    # No made-up fallback score: LLMError / LLMUnavailableError reach the caller, which retries or reports it
+    text = await llm_cache.get_or_generate(
+        generate, resume_text, job_title, job_description, SCORE_PROMPT_VERSION, model_name, validate=parse_score
+    )
+    return parse_score(text)
 
 
 
@@ -143,10 +157,15 @@ async def get_required_skills_from_llm(job_title: str, job_description: str = ""
     List 8 to 12 important skills (technical and soft) required for this role.
     Return the list as bullet points, one per line.
     """
+    async def generate():
+        return await llm_client.generate(prompt, GEMINI_MODEL_NAME)
+
     try:
-        response = gemini.generate_content(prompt)
-        print("⚡ Gemini response:", response.text)
-        lines = response.text.splitlines()
+        text = await llm_cache.get_or_generate(
+            generate, "", job_title, job_description, SKILLS_PROMPT_VERSION, GEMINI_MODEL_NAME
+        )
+        print("⚡ Gemini response:", text)
+        lines = text.splitlines()
         skills = [line.strip("-• ").strip() for line in lines if line.strip()]
         # print(skills)
         return skills
@@ -154,10 +173,284 @@ async def get_required_skills_from_llm(job_title: str, job_description: str = ""
         print(f"❌ Gemini skill generation failed: {e}")
         return []
 
+# ============ LOCAL PRE-SCREENING ============
+
+# Hashed vocabulary: terms map to one of PRESCREEN_BUCKETS slots, so vectors are sparse
+# (sorted index array + weight array) and document frequencies live in one NumPy array
+PRESCREEN_BUCKETS = 1 << 18
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from", "as",
+    "is", "are", "be", "was", "were", "this", "that", "will", "you", "we", "our", "your", "their",
+    "it", "its", "have", "has", "not", "but", "can", "able", "who", "all", "any", "etc",
+}
+TERM_RE = re.compile(r"[a-z0-9][a-z0-9+#\.]*[a-z0-9+#]|[a-z0-9]")
+
+
+def tokenize_terms(text):
+    return [t for t in TERM_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def hashed_term_counts(tokens):
+    if not tokens:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    hashes = np.fromiter((zlib.crc32(t.encode()) for t in tokens), dtype=np.int64, count=len(tokens))
+    indices, counts = np.unique(hashes % PRESCREEN_BUCKETS, return_counts=True)
+    return indices, counts.astype(np.float64)
+
+
+class TermStats:
+    # Document frequencies behind the BM25/TF-IDF idf. Scoring only reads them, so a resume gets the same
+    # pre-screen score whatever was screened before it, in whichever worker, before or after a restart.
+
+    def __init__(self):
+        self.df = np.zeros(PRESCREEN_BUCKETS, dtype=np.int32)
+        self.docs = 0
+        self.total_length = 0
+
+    def add(self, indices, length):
+        # Only for building a snapshot from a fixed corpus, never from live screening
+        self.df[indices] += 1
+        self.docs += 1
+        self.total_length += length
+
+    @property
+    def avgdl(self):
+        return self.total_length / self.docs if self.docs else PRESCREEN_AVG_DOC_LENGTH
+
+    def save(self, path):
+        np.savez_compressed(path, df=self.df, docs=self.docs, total_length=self.total_length)
+
+    @classmethod
+    def load(cls, path):
+        stats = cls()
+        with np.load(path) as data:
+            if data["df"].shape != stats.df.shape:
+                raise ValueError(f"Term stats snapshot {path} was built for a different bucket count")
+            stats.df = data["df"].astype(np.int32)
+            stats.docs = int(data["docs"])
+            stats.total_length = int(data["total_length"])
+        return stats
+
+    def idf(self, indices):
+        df = self.df[indices]
+        return np.log1p((self.docs - df + 0.5) / (df + 0.5))
+
+
+term_stats = TermStats.load(PRESCREEN_TERM_STATS_PATH) if PRESCREEN_TERM_STATS_PATH else TermStats()
+
+
+def tfidf_cosine(a_idx, a_tf, b_idx, b_tf, stats=term_stats):
+    if not len(a_idx) or not len(b_idx):
+        return 0.0
+    a_w = (1 + np.log(a_tf)) * stats.idf(a_idx)
+    b_w = (1 + np.log(b_tf)) * stats.idf(b_idx)
+    _, ia, ib = np.intersect1d(a_idx, b_idx, assume_unique=True, return_indices=True)
+    norm = np.linalg.norm(a_w) * np.linalg.norm(b_w)
+    return float(a_w[ia] @ b_w[ib] / norm) if norm else 0.0
+
+
+def bm25_normalized(doc_idx, doc_tf, doc_length, query_idx, stats=term_stats):
+    # BM25 of the resume for the job's terms, divided by its upper bound (every term with tf -> inf)
+    if not len(doc_idx) or not len(query_idx):
+        return 0.0
+    idf = stats.idf(query_idx)
+    upper = float(np.sum(idf) * (BM25_K1 + 1))
+    if upper <= 0:
+        return 0.0
+    _, iq, id_ = np.intersect1d(query_idx, doc_idx, assume_unique=True, return_indices=True)
+    tf = doc_tf[id_]
+    denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_length / stats.avgdl)
+    return float(np.sum(idf[iq] * tf * (BM25_K1 + 1) / denom) / upper)
+
+
+def job_term_vector(job_title, job_description):
+    return hashed_term_counts(tokenize_terms(f"{job_title} {job_description or ''}"))
+
+
+def prescreen_score(resume_text, job_title, job_description, skill_score, has_required_skills=True, job_vector=None):
+    # Cheap lexical relevance in [0, 1]: TF-IDF cosine + normalized BM25 + the skill match ratio.
+    # `job_vector` is the precomputed (indices, counts) pair from the job's artifacts, if any.
+    resume_tokens = tokenize_terms(resume_text)
+    resume_idx, resume_tf = hashed_term_counts(resume_tokens)
+
+    job_idx, job_tf = job_vector if job_vector is not None else job_term_vector(job_title, job_description)
+    tfidf = tfidf_cosine(resume_idx, resume_tf, job_idx, job_tf)
+    bm25 = bm25_normalized(resume_idx, resume_tf, len(resume_tokens), job_idx)
+
+    if has_required_skills:
+        score = 0.4 * skill_score + 0.35 * tfidf + 0.25 * bm25
+    else:
+        score = 0.6 * tfidf + 0.4 * bm25
+    return {"score": round(score, 4), "tfidf": round(tfidf, 4), "bm25": round(bm25, 4)}
+
+
+# ============ RESUME COMPACTION ============
+# Whitespace, page furniture and low-value sections cost prompt tokens and latency without changing the score
+
+SECTION_HEADINGS = {
+    "summary": ("summary", "professional summary", "profile", "career objective", "objective", "about me"),
+    "experience": (
+        "experience", "work experience", "professional experience", "employment", "employment history",
+        "work history", "internship", "internships"
+    ),
+    "skills": ("skills", "technical skills", "key skills", "core competencies", "technologies", "tools"),
+    "projects": ("projects", "academic projects", "personal projects", "key projects"),
+    "education": ("education", "academic background", "academics", "qualifications"),
+    "certifications": ("certifications", "certificates", "licenses", "courses", "training"),
+    "publications": ("publications", "papers", "research", "conference papers"),
+    "awards": ("awards", "achievements", "honors", "honours", "accomplishments"),
+    "other": (
+        "interests", "hobbies", "languages", "references", "activities", "extracurricular activities",
+        "volunteering", "personal details", "declaration"
+    ),
+}
+HEADING_ALIASES = {alias: section for section, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+# Base weight per section; job relevance scales it up to 3x. "header" is the name/contact block before
+# the first heading and always survives.
+SECTION_PRIORITY = {
+    "header": 100.0, "skills": 5.0, "experience": 5.0, "summary": 3.0, "projects": 3.0, "education": 2.0,
+    "certifications": 1.5, "awards": 1.0, "publications": 0.5, "other": 0.25,
+}
+
+PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?-?\s*\d{1,3}\s*-?(?:\s*(?:of|/)\s*\d{1,3})?$", re.IGNORECASE)
+# Repeated lines that look like a running page header/footer are dropped from their second occurrence on
+PAGE_FURNITURE_RE = re.compile(r"@|https?://|www\.|\bpage\b|\bresume\b|curriculum vitae|\bconfidential\b", re.IGNORECASE)
+HEADING_RE = re.compile(r"^([a-z][a-z &/]{1,40}?)\s*(?:[:\-\u2013|].*)?$", re.IGNORECASE)
+
+
+def normalize_resume_lines(text):
+    lines = []
+    for raw in (text or "").replace("\r", "\n").replace("\f", "\n").splitlines():
+        line = re.sub(r"[ \t\u00a0\u200b]+", " ", raw).strip()
+        # Separator rules and bullet glyphs on their own line
+        if line and not re.search(r"[A-Za-z0-9]", line):
+            line = ""
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def strip_page_boilerplate(lines):
+    counts = {}
+    for line in lines:
+        if line:
+            counts[line.lower()] = counts.get(line.lower(), 0) + 1
+    seen, kept = set(), []
+    for line in lines:
+        key = line.lower()
+        if line and PAGE_NUMBER_RE.match(line):
+            continue
+        repeated = counts.get(key, 0) >= 3 or (counts.get(key, 0) >= 2 and PAGE_FURNITURE_RE.search(line))
+        if line and repeated and len(line) <= 100 and key in seen:
+            continue
+        seen.add(key)
+        kept.append(line)
+    return kept
+
+
+def match_heading(line):
+    # "Experience", "WORK HISTORY:" or "Skills: Python, SQL" -> section name, else None
+    match = HEADING_RE.match(line)
+    return HEADING_ALIASES.get(match.group(1).strip().lower()) if match else None
+
+
+def split_sections(lines):
+    # [(section, lines)] in document order; text before the first heading is the "header"
+    sections = [("header", [])]
+    for line in lines:
+        section = match_heading(line) if line else None
+        if section is not None:
+            sections.append((section, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, body) for name, body in sections if any(body)]
+
+
+def section_relevance(body, job_terms):
+    # Share of the job's terms this section mentions
+    if not job_terms:
+        return 0.0
+    return len(job_terms.intersection(tokenize_terms(" ".join(body)))) / len(job_terms)
+
+
+def compact_resume(resume_text, job_title="", job_description="", token_budget=RESUME_TOKEN_BUDGET):
+    # Returns {"text", "original_tokens", "tokens", "trimmed"}. Over budget, each section first gets a share
+    # of the budget proportional to its weight (base priority x job relevance), then what is left over goes
+    # to the heaviest sections first; sections are cut from the end and keep the resume's own order
+    original_tokens = estimate_tokens(resume_text)
+    sections = split_sections(strip_page_boilerplate(normalize_resume_lines(resume_text)))
+    job_terms = set(tokenize_terms(f"{job_title} {job_description or ''}"))
+
+    def cost(line):
+        return (len(line) + 1) / 4
+
+    if sum(cost(line) for _, body in sections for line in body) <= token_budget:
+        text = "\n".join("\n".join(body) for _, body in sections).strip()
+        return {"text": text, "original_tokens": original_tokens, "tokens": estimate_tokens(text), "trimmed": []}
+
+    weights = [
+        SECTION_PRIORITY.get(name, 1.0) * (1 + 2 * section_relevance(body, job_terms)) for name, body in sections
+    ]
+    ranked = sorted(range(len(sections)), key=lambda i: -weights[i])
+    taken = [0] * len(sections)  # leading lines kept per section
+    remaining = token_budget
+
+    def take(i, allowance):
+        nonlocal remaining
+        body = sections[i][1]
+        allowance = min(allowance, remaining)
+        while taken[i] < len(body) and cost(body[taken[i]]) <= allowance:
+            allowance -= cost(body[taken[i]])
+            remaining -= cost(body[taken[i]])
+            taken[i] += 1
+
+    for i in ranked:
+        take(i, token_budget * weights[i] / sum(weights))
+    for i in ranked:
+        take(i, remaining)
+
+    kept, trimmed = [], []
+    for i, (name, body) in enumerate(sections):
+        count = taken[i]
+        if count == 1 and len(body) > 1 and name != "header":
+            # A heading with nothing under it is not worth its tokens
+            count = 0
+        if count < len(body):
+            trimmed.append(name)
+        if count:
+            kept.append("\n".join(body[:count]).strip())
+    text = "\n".join(kept).strip()
+    return {"text": text, "original_tokens": original_tokens, "tokens": estimate_tokens(text), "trimmed": trimmed}
+
+
+def resume_for_prompt(resume_text, job_title, job_description, prompt):
+    # The resume text a prompt actually carries; tokens saved are logged and counted per prompt kind
+    if not COMPACTION_ENABLED:
+        return resume_text
+    with timed_stage("compact"):
+        compacted = compact_resume(resume_text, job_title, job_description)
+    saved = compacted["original_tokens"] - compacted["tokens"]
+    RESUME_PROMPT_TOKENS.inc(compacted["original_tokens"], prompt=prompt, kind="original")
+    RESUME_PROMPT_TOKENS.inc(compacted["tokens"], prompt=prompt, kind="sent")
+    if saved > 0:
+        trimmed = f", trimmed {', '.join(compacted['trimmed'])}" if compacted["trimmed"] else ""
+        print(f"✂️ Resume compacted for {prompt} prompt: {compacted['original_tokens']} -> {compacted['tokens']} tokens (saved {saved}{trimmed})")
+    return compacted["text"]
+
+
 # Main analysis function
-async def analyze_resume(file_path, job_title, job_description, job_id, thresholds, db: AsyncSession,required_skills=None):
-    resume_text = extract_text(file_path)
-    data = parse_resume(file_path)
+async def analyze_resume(file_path, job_title, job_description, job_id, thresholds, db: AsyncSession,required_skills=None, resume=None, artifacts=None, reuse_llm_score=None):
+    # `resume` is an already extracted result from the extraction service; parse the file once otherwise.
+    # `artifacts` are the job's precomputed JobArtifacts (skills, matcher, term vector, prompt prefix).
+    # `reuse_llm_score` is the LLM score of a near-duplicate already screened for this job; no Gemini call then.
+    data = resume or extraction_service.extract_file(file_path)
+    resume_text = data["text"]
 
     name = data.get("name")
     if not name or len(name.strip()) < 2:
@@ -172,35 +465,51 @@ async def analyze_resume(file_path, job_title, job_description, job_id, threshol
     email = data.get("email") or extract_email(resume_text)
     skills = data.get("skills", [])
     # required_skills = ROLE_SKILLS.get(job_title, set())
-    required_skills = required_skills.split(",") if required_skills else ROLE_SKILLS.get(job_title, set())
+    # Compiled once per job and skill list, reused for every resume screened against it
+    if artifacts is not None:
+        matcher = artifacts.matcher
+    else:
+        matcher = skill_matchers.get(job_id, required_skills if required_skills else sorted(ROLE_SKILLS.get(job_title, set())))
+    required_skills = matcher.skills
     if not skills:
-        skills = extract_skills_fallback(resume_text, required_skills)
+        with timed_stage("skill_match"):
+            skills = extract_skills_fallback(resume_text, required_skills, matcher)
 
     raw_exp = data.get("total_experience", 0)
     exp_years = adjust_experience(raw_exp, resume_text)
     level = get_experience_level(exp_years)
 
-    llm_score = get_gemini_score(resume_text, job_title, job_description)
     skill_score, matched_skills = compute_skill_match(skills, required_skills)
 
-    final_score = 0.7 * llm_score + 0.3 * skill_score
-
     threshold_map = thresholds or {"junior": 0.45, "mid": 0.55, "senior": 0.6}
     threshold = threshold_map.get(level, 0.5)
-    status = "ACCEPTED" if final_score >= threshold else "REJECTED"
-
-    # Store in database
-    log = ResumeLog(
-        name=name,
-        email=email,
-        role=job_title,
-        experience_level=level,
-        final_score=round(final_score, 2),
-        status=status,
-        job_id=job_id
-    )
-    db.add(log)
-    await db.commit()
+
+    # Local gate: only plausible candidates reach the main Gemini model
+    with timed_stage("prescreen"):
+        prescreen = prescreen_score(
+            resume_text, job_title, job_description, skill_score, bool(required_skills),
+            job_vector=artifacts.term_vector if artifacts is not None else None
+        )
+    prompt_prefix = artifacts.prompt_prefix if artifacts is not None else None
+    if PRESCREEN_ENABLED and prescreen["score"] < PRESCREEN_CUTOFF and PRESCREEN_MODE == "reject":
+        llm_score = None
+        final_score = prescreen["score"]
+        score_source = "prescreen"
+        status = "REJECTED"
+    else:
+        if reuse_llm_score is not None:
+            llm_score = reuse_llm_score
+            score_source = "duplicate"
+        elif PRESCREEN_ENABLED and prescreen["score"] < PRESCREEN_CUTOFF:
+            llm_score = await get_gemini_score(resume_text, job_title, job_description, model_name=GEMINI_CHEAP_MODEL_NAME, prompt_prefix=prompt_prefix)
+            score_source = "llm_cheap"
+        else:
+            llm_score = await get_gemini_score(resume_text, job_title, job_description, prompt_prefix=prompt_prefix)
+            score_source = "llm"
+        final_score = 0.7 * llm_score + 0.3 * skill_score
+        status = "ACCEPTED" if final_score >= threshold else "REJECTED"
+
+    # Persisting the ResumeLog is left to the caller (screening.screen_upload) so it is one upsert
 
     return {
         "name": name,
@@ -208,11 +517,244 @@ async def analyze_resume(file_path, job_title, job_description, job_id, threshol
         "job_title": job_title,
         "experience_years": exp_years,
         "level": level,
-        "llm_score": round(llm_score, 2),
+        "llm_score": round(llm_score, 2) if llm_score is not None else None,
         "skill_score": round(skill_score, 2),
+        "prescreen_score": prescreen["score"],
         "final_score": round(final_score, 2),
+        "score_source": score_source,
         "status": status,
         "matched_skills": matched_skills,
         "required_skills": list(required_skills),
         "job_id": job_id
     }
+
+
+# ============ MULTI-JOB ANALYSIS (/analyze_resume) ============
+
+def build_analysis_prompt(resume_text, title, desc):
+    return f"""
+You are an expert ATS (Applicant Tracking System) resume reviewer.
+
+Please evaluate the given resume **strictly** for the job title and description provided.
+
+Your output must include the following **four sections** in this **exact format**, formatted clearly for human readability:
+
+---
+
+###  Job Title  
+State the job title being analyzed.
+
+###  ATS Score  
+Return a numeric ATS Score (0 to 100), **formatted exactly like this**:  
+**ATS Score: <number>**
+
+This score should reflect how well the resume matches the job description based on:
+- Skill keyword matching
+- Relevance of experience
+- Formatting & structure
+- Language/tone
+
+###  Missing Skills  
+List the most important skills that are **mentioned in the job description but missing in the resume**.
+
+###  Suggestions to Improve Resume  
+Give **clear and actionable suggestions** to improve the resume for better alignment with this job, such as:
+- Skills to add
+- Experience to rephrase
+- Formatting tips
+
+Do **NOT** include any JSON or code formatting — return plain text only.
+
+---
+
+📄 Resume:
+\"\"\"{resume_text}\"\"\"
+
+🧾 Job Title: {title}
+📝 Job Description:
+\"\"\"{desc}\"\"\"
+"""
+
+def extract_ats_score(text: str) -> int:
+    score_patterns = [
+        r"ATS Score\s*[:\-]?\s*(\d{1,3})",
+        r"score\s*(?:is|of)?\s*(\d{1,3})\s*(?:/100)?",
+        r"(\d{1,3})\s*/\s*100"
+    ]
+    for pattern in score_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return min(max(int(match.group(1)), 0), 100)
+    return 0
+
+async def analyze_job_match(resume_text, title, desc, timeout=LLM_CALL_TIMEOUT_SECONDS):
+    resume_text = resume_for_prompt(resume_text, title, desc, "analyze")
+    prompt = build_analysis_prompt(resume_text, title, desc)
+
+    async def generate():
+        return await llm_client.generate(prompt, GEMINI_MODEL_NAME, timeout=timeout)
+
+    text = (await llm_cache.get_or_generate(
+        generate, resume_text, title, desc, ANALYZE_PROMPT_VERSION, GEMINI_MODEL_NAME
+    )).strip()
+    print(" Gemini Raw Response:")
+    print(text)
+
+    return {
+        "job_title": title,
+        "ats_score": extract_ats_score(text),
+        "suggestions": text
+    }
+
+async def analyze_resume_for_jobs(resume_text, titles, descriptions, concurrency=ANALYZE_CONCURRENCY, timeout=LLM_CALL_TIMEOUT_SECONDS):
+    # Runs one Gemini call per title concurrently; results keep input order and
+    # a failing title is reported on its own entry instead of failing the batch
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(title, desc):
+        async with semaphore:
+            try:
+                return await analyze_job_match(resume_text, title, desc, timeout=timeout)
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            print(f"❌ Analysis failed for '{title}': {error}")
+            return {
+                "job_title": title,
+                "ats_score": None,
+                "suggestions": "",
+                "error": error
+            }
+
+    return await asyncio.gather(*(run(title, desc) for title, desc in zip(titles, descriptions)))
+
+
+# ============ BATCHED MULTI-JOB ANALYSIS ============
+
+BATCH_PROMPT_HEADER = """
+You are an expert ATS (Applicant Tracking System) resume reviewer.
+
+Evaluate the resume below **strictly** against EACH of the numbered jobs that follow it.
+
+Return ONLY a JSON array with one object per job, in the same order, shaped exactly like:
+[{"index": <job number>, "job_title": "<title>", "ats_score": <0-100>, "missing_skills": ["..."], "suggestions": ["..."]}]
+
+The ATS score should reflect how well the resume matches that job based on skill keyword matching,
+relevance of experience, formatting & structure and language/tone. "missing_skills" lists the most
+important skills mentioned in the job description but missing in the resume. "suggestions" gives
+clear and actionable suggestions to improve the resume for that job.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic (~4 characters per token); good enough for budgeting
+    return len(text or "") // 4 + 1
+
+
+def build_batch_prompt(resume_text, jobs):
+    # `jobs` is a list of (index, title, description)
+    job_blocks = "\n".join(
+        f"### Job {index}\nJob Title: {title}\nJob Description:\n\"\"\"{desc}\"\"\"\n"
+        for index, title, desc in jobs
+    )
+    return f"""{BATCH_PROMPT_HEADER}
+📄 Resume:
+\"\"\"{resume_text}\"\"\"
+
+{job_blocks}"""
+
+
+def chunk_jobs_by_budget(resume_text, jobs, token_budget=BATCH_TOKEN_BUDGET):
+    # The resume is sent once per chunk; pack as many job descriptions as fit in the budget
+    base_cost = estimate_tokens(BATCH_PROMPT_HEADER) + estimate_tokens(resume_text)
+    chunks, current, used = [], [], base_cost
+    for job in jobs:
+        cost = estimate_tokens(job[1]) + estimate_tokens(job[2]) + 20
+        if current and used + cost > token_budget:
+            chunks.append(current)
+            current, used = [], base_cost
+        current.append(job)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_batch_response(text):
+    # Tolerate code fences or prose around the JSON array
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    if not match:
+        raise ValueError("Gemini batch response did not contain a JSON array")
+    items = json.loads(match.group(0))
+    return {int(item["index"]): item for item in items if isinstance(item, dict) and "index" in item}
+
+
+def format_batch_suggestions(title, score, missing_skills, suggestions):
+    # Same section layout the single-job prompt produces, so the frontend renders both alike
+    missing = "\n".join(f"- {skill}" for skill in missing_skills) or "- None"
+    tips = "\n".join(f"- {tip}" for tip in suggestions) or "- None"
+    return (
+        f"###  Job Title\n{title}\n\n"
+        f"###  ATS Score\n**ATS Score: {score}**\n\n"
+        f"###  Missing Skills\n{missing}\n\n"
+        f"###  Suggestions to Improve Resume\n{tips}"
+    )
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [value] if value else []
+
+
+async def analyze_resume_batched(resume_text, titles, descriptions, token_budget=BATCH_TOKEN_BUDGET, concurrency=ANALYZE_CONCURRENCY, timeout=LLM_CALL_TIMEOUT_SECONDS):
+    # Scores one resume against many jobs with one Gemini call per token-budgeted chunk,
+    # then splits the reply back into the usual {"job_title", "ats_score", "suggestions"} entries
+    jobs = [(index, title, desc) for index, (title, desc) in enumerate(zip(titles, descriptions), start=1)]
+    # One compaction for the whole request, weighted towards every job in it, so chunks share a resume text
+    resume_text = resume_for_prompt(resume_text, " ".join(titles), " ".join(descriptions), "analyze_batch")
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(chunk):
+        prompt = build_batch_prompt(resume_text, chunk)
+
+        async def generate():
+            return await llm_client.generate(prompt, GEMINI_MODEL_NAME, timeout=timeout)
+
+        async with semaphore:
+            try:
+                text = await llm_cache.get_or_generate(
+                    generate,
+                    resume_text,
+                    json.dumps([title for _, title, _ in chunk]),
+                    json.dumps([desc for _, _, desc in chunk]),
+                    BATCH_PROMPT_VERSION,
+                    GEMINI_MODEL_NAME
+                )
+                parsed = parse_batch_response(text)
+                error = None
+            except Exception as e:
+                parsed, error = {}, str(e) or e.__class__.__name__
+
+        results = []
+        for index, title, _ in chunk:
+            item = parsed.get(index)
+            if item is None:
+                reason = error or "Job missing from Gemini batch response"
+                print(f"❌ Batched analysis failed for '{title}': {reason}")
+                results.append({"job_title": title, "ats_score": None, "suggestions": "", "error": reason})
+                continue
+            try:
+                score = min(max(int(float(item.get("ats_score", 0))), 0), 100)
+            except (TypeError, ValueError):
+                score = 0
+            results.append({
+                "job_title": title,
+                "ats_score": score,
+                "suggestions": format_batch_suggestions(
+                    title, score, _as_list(item.get("missing_skills")), _as_list(item.get("suggestions"))
+                )
+            })
+        return results
+
+    chunk_results = await asyncio.gather(*(run(chunk) for chunk in chunk_jobs_by_budget(resume_text, jobs, token_budget)))
+    return [entry for chunk in chunk_results for entry in chunk]
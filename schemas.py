@@ -23,6 +23,19 @@ class EmailRequest(BaseModel):
     job_id :int
     sender_email: str
     sender_password: str
+
+class BulkEmailRecipient(BaseModel):
+    email: str
+    name: str
+    status: str
+    best_role: str
+    score: float
+    job_id: int
+
+class BulkEmailRequest(BaseModel):
+    sender_email: str
+    sender_password: str
+    recipients: list[BulkEmailRecipient]
 # ------------------- JobCreate -------------------
 
 class JobCreate(BaseModel):
@@ -41,6 +54,7 @@ class AdminConfigCreate(BaseModel):
     smtp_port: str
     smtp_username: str
     smtp_password: str
+    current_password: Optional[str] = None  # required to replace an existing config
 
 class AdminConfigOut(BaseModel):
     email: EmailStr
@@ -0,0 +1,72 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from blob_store import StoredBlob
+from crud import resume_log_values, resume_file_values, discard_unreferenced_blob
+from models import Job
+from resume_extraction import extraction_service, extract_email, ResumeParseError
+from resume_screening_core import analyze_resume
+from job_artifacts import job_artifacts
+from write_buffer import result_write_buffer
+from metrics import timed_stage
+from search_index import resume_search_values
+from near_duplicates import duplicate_index, minhash_signature, NEAR_DUPLICATE_REUSE_SCORE
+
+
+DEFAULT_THRESHOLDS = {"junior": 0.45, "mid": 0.55, "senior": 0.6}
+
+
+# Full single-resume pipeline shared by /screen and the batch workers:
+# parse -> analyze -> link stored file + write ResumeLog
+async def screen_upload(db: AsyncSession, job: Job, blob: StoredBlob, filename: str):
+    # Parse once, straight from the resume store; re-uploads of the same file are served from the extraction cache
+    try:
+        resume = await extraction_service.extract_path_async(blob.path, blob.sha256, filename)
+    except ResumeParseError:
+        await discard_unreferenced_blob(db, blob)
+        raise
+
+    # Job-side inputs (skills, matcher, term vector, prompt prefix) are built once per job version
+    with timed_stage("job_artifacts"):
+        artifacts = await job_artifacts.get(db, job)
+
+    # Near-duplicate check (MinHash + LSH) before any LLM work: a copy of a resume already screened for
+    # this version of the job takes its score, any other copy is only flagged
+    with timed_stage("dedupe"):
+        signature = minhash_signature(resume["text"])
+        email = resume.get("email") or extract_email(resume["text"])
+        match = await duplicate_index.find(signature, job.id, email, artifacts.source_hash)
+    reuse_llm_score = match["llm_score"] if match and match["score_reusable"] and NEAR_DUPLICATE_REUSE_SCORE else None
+
+    # Run the analysis
+    result = await analyze_resume(
+        file_path=None,
+        job_title=job.title,
+        job_description=job.description,
+        job_id=job.id,
+        required_skills=job.required_skills,
+        thresholds=DEFAULT_THRESHOLDS,
+        db=db,
+        resume=resume,
+        artifacts=artifacts,
+        reuse_llm_score=reuse_llm_score
+    )
+    result["near_duplicate_of"] = (
+        {key: match[key] for key in ("job_id", "email", "similarity")} if match else None
+    )
+
+    #  Save to DB: one upsert of the ResumeLog, its (job_id, email) -> blob entry and its search index row, one transaction;
+    #  group-committed with other results when the buffer is on
+    with timed_stage("db_write"):
+        await result_write_buffer.write(
+            db,
+            resume_log_values(result, job.id),
+            resume_file_values(blob, job.id, result["email"], filename),
+            resume_search_values(result, resume, job.id)
+        )
+
+    with timed_stage("dedupe"):
+        await duplicate_index.add(
+            job.id, result["email"], blob.sha256, signature, result["llm_score"], match, artifacts.source_hash
+        )
+
+    return result
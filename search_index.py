@@ -0,0 +1,205 @@
+import os
+import re
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Extracted resume text beyond this many characters is not indexed
+SEARCH_MAX_CHARS = int(os.getenv("SEARCH_MAX_CHARS", "20000"))
+# Postgres text search configuration (stemming / stop words)
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+
+# One search row per resume_logs row, keyed by its id (stable across re-applications, which upsert in place).
+# SQLite: an FTS5 table whose rowid is the log id. Postgres: a table with a stored, weighted tsvector + GIN.
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS resume_search USING fts5("
+    "name, email, skills, content, tokenize = \"porter unicode61 tokenchars '+#'\")",
+)
+POSTGRES_DDL = (
+    f"""CREATE TABLE IF NOT EXISTS resume_search (
+        log_id INTEGER PRIMARY KEY REFERENCES resume_logs(id) ON DELETE CASCADE,
+        name TEXT,
+        email TEXT,
+        skills TEXT,
+        content TEXT,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(skills, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(content, '')), 'B')
+        ) STORED
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_resume_search_document ON resume_search USING GIN (document)",
+)
+
+# Columns returned per hit, next to rank and snippet
+HIT_COLUMNS = """
+    l.id, l.name, l.email, l.role, l.experience_level, l.final_score, l.score_source, l.status,
+    l.timestamp, j.title AS job_title, l.job_id
+"""
+
+
+def search_dialect(dialect_name):
+    return "postgresql" if dialect_name == "postgresql" else "sqlite"
+
+
+def create_search_index(sync_conn):
+    # Run from init_db next to create_all; neither FTS5 tables nor generated tsvector columns are models
+    ddl = POSTGRES_DDL if search_dialect(sync_conn.dialect.name) == "postgresql" else SQLITE_DDL
+    for statement in ddl:
+        sync_conn.execute(text(statement))
+
+
+def resume_search_values(result, resume, job_id):
+    # Keyed like resume_logs rows; log_id is filled in once the log upsert has returned it
+    return {
+        "job_id": job_id,
+        "email": result["email"],
+        "name": result["name"],
+        "skills": " ".join(result.get("matched_skills") or []),
+        "content": (resume.get("text") or "")[:SEARCH_MAX_CHARS],
+    }
+
+
+async def index_resumes(db: AsyncSession, rows):
+    # `rows` carry log_id; replaces any earlier entry for the same log. The caller commits.
+    if not rows:
+        return
+    log_ids = [row["log_id"] for row in rows]
+    entries = [{key: row[key] for key in ("log_id", "name", "email", "skills", "content")} for row in rows]
+    await delete_from_index(db, log_ids)
+    if search_dialect(db.bind.dialect.name) == "postgresql":
+        stmt = text(
+            "INSERT INTO resume_search (log_id, name, email, skills, content) "
+            "VALUES (:log_id, :name, :email, :skills, :content)"
+        )
+    else:
+        stmt = text(
+            "INSERT INTO resume_search (rowid, name, email, skills, content) "
+            "VALUES (:log_id, :name, :email, :skills, :content)"
+        )
+    await db.execute(stmt, entries)
+
+
+async def delete_from_index(db: AsyncSession, log_ids):
+    if not log_ids:
+        return
+    key = "log_id" if search_dialect(db.bind.dialect.name) == "postgresql" else "rowid"
+    stmt = text(f"DELETE FROM resume_search WHERE {key} IN :log_ids").bindparams(bindparam("log_ids", expanding=True))
+    await db.execute(stmt, {"log_ids": list(log_ids)})
+
+
+def fts5_query(query):
+    # User input -> FTS5 syntax: every word / "quoted phrase" must match, `term*` is a prefix search,
+    # OR between terms is kept; anything else is quoted so punctuation can't break the query
+    parts = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        if phrase:
+            parts.append('"' + phrase.replace('"', "") + '"')
+        elif word == "OR" and parts and parts[-1] != "OR":
+            parts.append("OR")
+        else:
+            prefix = word.endswith("*")
+            word = re.sub(r"[^\w+#.\-]", "", word).strip(".-")
+            if word:
+                parts.append(f'"{word}"' + ("*" if prefix else ""))
+    while parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts)
+
+
+async def search_resumes(db: AsyncSession, created_by, query, job_id=None, status=None, limit=20, offset=0):
+    # Ranked hits on the admin's jobs, best first; asks for one extra row to tell whether there is a next page
+    filters, params = ["j.created_by = :created_by"], {"created_by": created_by, "limit": limit + 1, "offset": offset}
+    if job_id is not None:
+        filters.append("l.job_id = :job_id")
+        params["job_id"] = job_id
+    if status:
+        filters.append("l.status = :status")
+        params["status"] = status.upper()
+    where = " AND ".join(filters)
+
+    if search_dialect(db.bind.dialect.name) == "postgresql":
+        params["query"] = query
+        stmt = text(f"""
+            SELECT {HIT_COLUMNS},
+                ts_rank_cd(s.document, q) AS rank,
+                ts_headline('{SEARCH_LANGUAGE}', s.content, q, 'MaxWords=20, MinWords=8') AS snippet
+            FROM resume_search s
+            JOIN resume_logs l ON l.id = s.log_id
+            JOIN jobs j ON j.id = l.job_id,
+            websearch_to_tsquery('{SEARCH_LANGUAGE}', :query) q
+            WHERE s.document @@ q AND {where}
+            ORDER BY rank DESC, l.id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+    else:
+        params["query"] = fts5_query(query)
+        if not params["query"]:
+            return [], None
+        # bm25() is lower-is-better; name/email and skills weigh more than body text
+        stmt = text(f"""
+            SELECT {HIT_COLUMNS},
+                -bm25(resume_search, 10.0, 10.0, 5.0, 1.0) AS rank,
+                snippet(resume_search, 3, '[', ']', '…', 16) AS snippet
+            FROM resume_search
+            JOIN resume_logs l ON l.id = resume_search.rowid
+            JOIN jobs j ON j.id = l.job_id
+            WHERE resume_search MATCH :query AND {where}
+            ORDER BY rank DESC, l.id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+
+    rows = (await db.execute(stmt, params)).all()
+    next_offset = offset + limit if len(rows) > limit else None
+    hits = []
+    for row in rows[:limit]:
+        hit = dict(row._mapping)
+        hit.pop("id")
+        hit["rank"] = round(float(hit["rank"]), 4)
+        hits.append(hit)
+    return hits, next_offset
+
+
+async def reindex_missing(db: AsyncSession, created_by, limit=500, after_id=0):
+    # Applications to the admin's jobs screened before the index existed: re-extract their stored resumes
+    # (usually from the extraction cache). Matched skills were not stored with them, so only name, email and
+    # text are indexed.
+    from blob_store import resume_store
+    from resume_extraction import extraction_service, ResumeParseError
+
+    key = "s.log_id" if search_dialect(db.bind.dialect.name) == "postgresql" else "s.rowid"
+    stmt = text(f"""
+        SELECT l.id, l.name, l.email, f.sha256, f.ext, f.filename
+        FROM resume_logs l
+        JOIN jobs j ON j.id = l.job_id
+        JOIN resume_files f ON f.job_id = l.job_id AND f.email = l.email
+        LEFT JOIN resume_search s ON {key} = l.id
+        WHERE {key} IS NULL AND j.created_by = :created_by AND l.id > :after_id
+        ORDER BY l.id
+        LIMIT :limit
+    """)
+    rows = (await db.execute(stmt, {"created_by": created_by, "limit": limit, "after_id": after_id})).all()
+    entries, failed = [], 0
+    for log_id, name, email, sha256, ext, filename in rows:
+        blob = resume_store.blob(sha256, ext)
+        if blob is None:
+            failed += 1
+            continue
+        try:
+            resume = await extraction_service.extract_path_async(blob.path, blob.sha256, filename or f"resume.{ext}")
+        except ResumeParseError:
+            failed += 1
+            continue
+        entries.append({
+            "log_id": log_id, "name": name, "email": email, "skills": "",
+            "content": (resume.get("text") or "")[:SEARCH_MAX_CHARS],
+        })
+    await index_resumes(db, entries)
+    await db.commit()
+    # Unreadable files are skipped by passing next_after_id back in
+    return {
+        "indexed": len(entries),
+        "failed": failed,
+        "next_after_id": rows[-1][0] if len(rows) == limit else None,
+    }
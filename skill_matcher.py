@@ -0,0 +1,150 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+
+# Canonical skill -> spellings seen in resumes and job posts
+SKILL_SYNONYMS = {
+    "Scikit-learn": ["scikit-learn", "scikit learn", "sklearn"],
+    "PostgreSQL": ["postgresql", "postgres", "psql"],
+    "MySQL": ["mysql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "JavaScript": ["javascript", "js", "ecmascript"],
+    "TypeScript": ["typescript"],
+    "React.js": ["react.js", "reactjs", "react"],
+    "Node.js": ["node.js", "nodejs"],
+    "Vue.js": ["vue.js", "vuejs", "vue"],
+    "Next.js": ["next.js", "nextjs"],
+    "UI/UX": ["ui/ux", "ux/ui", "ui ux", "user interface design", "user experience design"],
+    "Machine Learning": ["machine learning", "ml"],
+    "Deep Learning": ["deep learning"],
+    "Natural Language Processing": ["natural language processing", "nlp"],
+    "Computer Vision": ["computer vision", "opencv"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch", "torch"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Amazon Web Services": ["amazon web services", "aws"],
+    "Google Cloud Platform": ["google cloud platform", "google cloud", "gcp"],
+    "Microsoft Azure": ["microsoft azure", "azure"],
+    "CI/CD": ["ci/cd", "ci cd", "continuous integration"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    "Go": ["golang"],
+    "REST APIs": ["rest apis", "rest api", "restful"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+}
+
+# Max compiled matchers kept in memory
+MATCHER_CACHE_SIZE = 512
+
+# Characters that may be part of a skill token, so they must not touch a match.
+# "." only counts before a match, so "js" is not found inside "node.js" but "Python." still matches.
+TOKEN_CHARS = r"\w+#"
+
+
+def normalize_skill(skill: str) -> str:
+    # Case-fold and collapse whitespace/hyphen/underscore runs into one space
+    return re.sub(r"[\s\-_]+", " ", (skill or "").strip().lower()).strip()
+
+
+SYNONYM_INDEX = {
+    normalize_skill(alias): canonical
+    for canonical, aliases in SKILL_SYNONYMS.items()
+    for alias in aliases + [canonical]
+}
+
+
+def split_skills(required_skills):
+    # Accepts the comma separated Job.required_skills string or any iterable of skills
+    if isinstance(required_skills, str):
+        required_skills = required_skills.split(",")
+    seen, skills = set(), []
+    for skill in required_skills or []:
+        skill = (skill or "").strip()
+        key = normalize_skill(skill)
+        if key and key not in seen:
+            seen.add(key)
+            skills.append(skill)
+    return skills
+
+
+def _alias_pattern(alias):
+    # A space in a normalized alias matches any whitespace/hyphen/underscore run
+    return r"[\s\-_]+".join(re.escape(part) for part in alias.split(" "))
+
+
+class SkillMatcher:
+    # All aliases of all required skills compiled into one regex: a single linear pass per resume
+
+    def __init__(self, required_skills):
+        self.skills = split_skills(required_skills)
+        self.alias_to_skill = {}
+        for skill in self.skills:
+            key = normalize_skill(skill)
+            canonical = SYNONYM_INDEX.get(key)
+            aliases = {key}
+            if canonical:
+                aliases.update(normalize_skill(a) for a in SKILL_SYNONYMS[canonical] + [canonical])
+            for alias in aliases:
+                self.alias_to_skill.setdefault(alias, skill)
+
+        if self.alias_to_skill:
+            # Longest first so "machine learning" wins over "ml"-style prefixes
+            alternation = "|".join(
+                _alias_pattern(alias) for alias in sorted(self.alias_to_skill, key=len, reverse=True)
+            )
+            self.pattern = re.compile(
+                rf"(?<![{TOKEN_CHARS}.])(?:{alternation})(?![{TOKEN_CHARS}])", re.IGNORECASE
+            )
+        else:
+            self.pattern = None
+
+    def match(self, text):
+        if self.pattern is None or not text:
+            return []
+        found = set()
+        for m in self.pattern.finditer(text):
+            skill = self.alias_to_skill.get(normalize_skill(m.group(0)))
+            if skill:
+                found.add(skill)
+                if len(found) == len(self.skills):
+                    break
+        return [skill for skill in self.skills if skill in found]
+
+
+def skills_version(required_skills) -> str:
+    return hashlib.sha1("\n".join(split_skills(required_skills)).encode("utf-8")).hexdigest()
+
+
+class SkillMatcherCache:
+    # Matchers keyed by (job id, required_skills version); update_job/delete_job invalidate a job's entry
+
+    def __init__(self, max_entries=MATCHER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id, required_skills):
+        key = (job_id, skills_version(required_skills))
+        with self._lock:
+            matcher = self._cache.get(key)
+            if matcher is not None:
+                self._cache.move_to_end(key)
+                return matcher
+
+        matcher = SkillMatcher(required_skills)
+        with self._lock:
+            self._cache[key] = matcher
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return matcher
+
+    def invalidate(self, job_id):
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == job_id]:
+                del self._cache[key]
+
+
+skill_matchers = SkillMatcherCache()
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import os
+import time
+
+from sqlalchemy import select
+
+import models  # registers the tables on Base.metadata
+from blob_store import resume_store, BLOB_GRACE_SECONDS
+from database import engine, async_session
+from models import ResumeFile
+
+
+# Deletes resume store blobs no resume_files entry points to: ones left behind before deletes cleaned up
+# after themselves, and ones the cleanup skipped (still in their grace period, or a failed removal).
+# Dry run by default; --apply deletes them.
+
+REFERENCE_CHUNK = 500
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Remove resume files no application refers to")
+    parser.add_argument("--apply", action="store_true", help="delete the files (default: only report them)")
+    parser.add_argument(
+        "--min-age", type=int, default=BLOB_GRACE_SECONDS,
+        help="skip files written or re-uploaded less than this many seconds ago"
+    )
+    return parser.parse_args(argv)
+
+
+async def unreferenced(db, blobs):
+    referenced = set()
+    hashes = list({blob.sha256 for blob in blobs})
+    for start in range(0, len(hashes), REFERENCE_CHUNK):
+        referenced.update((await db.execute(
+            select(ResumeFile.sha256).where(ResumeFile.sha256.in_(hashes[start:start + REFERENCE_CHUNK])).distinct()
+        )).scalars().all())
+    return [blob for blob in blobs if blob.sha256 not in referenced]
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    cutoff = time.time() - args.min_age
+    blobs = []
+    for blob in resume_store.iter_blobs():
+        try:
+            if os.path.getmtime(blob.path) < cutoff:
+                blobs.append(blob)
+        except OSError:
+            continue
+    async with async_session() as db:
+        orphans = await unreferenced(db, blobs)
+    await engine.dispose()
+
+    size = sum(blob.size for blob in orphans)
+    print(f"🔍 {len(blobs)} stored resumes checked, {len(orphans)} unreferenced ({size} bytes)")
+    if not args.apply:
+        print("Dry run; pass --apply to delete them")
+        return
+    removed = sum(resume_store.remove(blob, min_age_seconds=args.min_age) for blob in orphans)
+    print(f"🗑️ Deleted {removed} files")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import shutil
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from blob_store import resume_store
+from database import async_session, engine
+from models import ScreeningTask, Job
+from resume_extraction import ResumeParseError, extraction_service, file_extension
+from resume_screening_core import analyze_resume_for_jobs, analyze_resume_batched
+from screening import screen_upload
+
+
+# Worker loops per process
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+# A running task whose lease expires (worker died / redeploy) is picked up again
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300"))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", "1.0"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+# Enqueueing is refused above this many pending tasks
+TASK_MAX_PENDING = int(os.getenv("TASK_MAX_PENDING", "5000"))
+# Uploads waiting for a worker; must survive restarts, so not a temp dir
+TASK_SPOOL_DIR = os.getenv("TASK_SPOOL_DIR", "task_spool")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class PermanentTaskError(Exception):
+    # Failures that retrying cannot fix
+    pass
+
+
+# ============ HANDLERS ============
+
+async def run_screen_task(db: AsyncSession, payload, file_content):
+    job = await db.get(Job, payload["job_id"])
+    if not job:
+        raise PermanentTaskError("Job not found")
+    if payload.get("sha256"):
+        # /screen already stored the upload
+        blob = resume_store.blob(payload["sha256"], payload["ext"])
+        if blob is None:
+            raise PermanentTaskError("Uploaded file is no longer available")
+    else:
+        blob = await resume_store.save_bytes(file_content, payload["filename"])
+    return await screen_upload(db, job, blob, payload["filename"])
+
+
+async def run_analyze_task(db: AsyncSession, payload, file_content):
+    resume = await extraction_service.extract_async(file_content, payload["filename"])
+    if not resume["text"].strip():
+        raise PermanentTaskError("Resume could not be parsed.")
+    if payload.get("mode") == "batch":
+        results = await analyze_resume_batched(resume["text"], payload["titles"], payload["descriptions"])
+    else:
+        results = await analyze_resume_for_jobs(resume["text"], payload["titles"], payload["descriptions"])
+    return {"results": results}
+
+
+HANDLERS = {
+    "screen": run_screen_task,
+    "analyze": run_analyze_task,
+}
+
+
+def serialize_task(task: ScreeningTask):
+    return {
+        "task_id": task.id,
+        "kind": task.kind,
+        "status": task.status,
+        "batch_id": task.batch_id,
+        "attempts": task.attempts,
+        "result": json.loads(task.result) if task.result else None,
+        "error": task.error,
+        "created_at": task.created_at,
+        "updated_at": task.updated_at,
+    }
+
+
+# ============ QUEUE ============
+
+class TaskQueue:
+    # Durable queue on the screening_tasks table; workers claim rows with
+    # FOR UPDATE SKIP LOCKED on Postgres and an atomic UPDATE ... WHERE id = (subquery) on SQLite
+
+    def __init__(self, workers=TASK_WORKERS, lease_seconds=TASK_LEASE_SECONDS, spool_dir=TASK_SPOOL_DIR):
+        self.workers = workers
+        self.lease = timedelta(seconds=lease_seconds)
+        self.spool_dir = spool_dir
+        self._tasks = []
+        self._wakeup = None
+
+    def new_task_id(self):
+        return uuid.uuid4().hex
+
+    def spool(self, task_id, filename, src):
+        # Streams an upload (bytes or file object) to the spool dir; returns the path
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{task_id}.{file_extension(filename)}")
+        with open(path, "wb") as out:
+            if isinstance(src, (bytes, bytearray)):
+                out.write(src)
+            else:
+                shutil.copyfileobj(src, out)
+        return path
+
+    async def pending_count(self, db: AsyncSession):
+        result = await db.execute(
+            select(func.count()).select_from(ScreeningTask).where(ScreeningTask.status.in_(("pending", "running")))
+        )
+        return result.scalar_one()
+
+    async def depth(self):
+        # Unfinished tasks by status, for /metrics
+        async with async_session() as db:
+            result = await db.execute(
+                select(ScreeningTask.status, func.count())
+                .where(ScreeningTask.status.in_(("pending", "running")))
+                .group_by(ScreeningTask.status)
+            )
+            return {"pending": 0, "running": 0, **dict(result.all())}
+
+    async def enqueue_many(self, db: AsyncSession, specs, batch_id=None):
+        # `specs` is a list of (task_id, kind, payload, file_path)
+        if await self.pending_count(db) + len(specs) > TASK_MAX_PENDING:
+            raise QueueFullError("Screening queue is full, please retry later")
+
+        now = datetime.utcnow()
+        tasks = [
+            ScreeningTask(
+                id=task_id,
+                kind=kind,
+                status="pending",
+                batch_id=batch_id,
+                payload=json.dumps(payload),
+                file_path=file_path,
+                attempts=0,
+                max_attempts=TASK_MAX_ATTEMPTS,
+                available_at=now,
+                created_at=now,
+                updated_at=now
+            )
+            for task_id, kind, payload, file_path in specs
+        ]
+        db.add_all(tasks)
+        await db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return tasks
+
+    async def enqueue(self, db: AsyncSession, kind, payload, file_content=None, filename=None):
+        task_id = self.new_task_id()
+        file_path = self.spool(task_id, filename, file_content) if file_content is not None else None
+        try:
+            tasks = await self.enqueue_many(db, [(task_id, kind, payload, file_path)])
+        except Exception:
+            self._remove_file(file_path)
+            raise
+        return tasks[0]
+
+    async def get(self, db: AsyncSession, task_id):
+        return await db.get(ScreeningTask, task_id)
+
+    # ---- worker side ----
+
+    async def claim(self):
+        now = datetime.utcnow()
+        owner = uuid.uuid4().hex
+        claimable = and_(
+            ScreeningTask.available_at <= now,
+            or_(
+                ScreeningTask.status == "pending",
+                and_(ScreeningTask.status == "running", ScreeningTask.lease_expires_at < now)
+            )
+        )
+        values = dict(
+            status="running",
+            lease_owner=owner,
+            lease_expires_at=now + self.lease,
+            attempts=ScreeningTask.attempts + 1,
+            updated_at=now
+        )
+
+        async with async_session() as db:
+            oldest = select(ScreeningTask.id).where(claimable).order_by(ScreeningTask.created_at).limit(1)
+            if engine.dialect.name == "postgresql":
+                task_id = (await db.execute(oldest.with_for_update(skip_locked=True))).scalar()
+                if task_id is None:
+                    await db.rollback()
+                    return None
+                stmt = update(ScreeningTask).where(ScreeningTask.id == task_id)
+            else:
+                # SQLite serialises writers, so a single UPDATE with the selection inlined is atomic
+                stmt = update(ScreeningTask).where(ScreeningTask.id == oldest.scalar_subquery(), claimable)
+            result = await db.execute(stmt.values(**values).execution_options(synchronize_session=False))
+            await db.commit()
+            if result.rowcount == 0:
+                return None
+            return (await db.execute(select(ScreeningTask).where(ScreeningTask.lease_owner == owner))).scalar_one_or_none()
+
+    async def _update_owned(self, task, **values):
+        # Only the current lease owner may write; a task re-claimed after lease expiry is left alone
+        async with async_session() as db:
+            result = await db.execute(
+                update(ScreeningTask)
+                .where(ScreeningTask.id == task.id, ScreeningTask.lease_owner == task.lease_owner)
+                .values(updated_at=datetime.utcnow(), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount > 0
+
+    async def _heartbeat(self, task):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await self._update_owned(task, lease_expires_at=datetime.utcnow() + self.lease)
+            except Exception:
+                # e.g. "database is locked": keep beating, the lease outlasts a few missed renewals
+                print(f"⚠️ Task {task.id} lease renewal failed")
+                traceback.print_exc()
+
+    def _remove_file(self, path):
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _run(self, task):
+        if task.attempts > task.max_attempts:
+            # Keeps being re-claimed after lease expiry: it probably kills the worker
+            await self._update_owned(task, status="failed", error="Gave up after repeated worker crashes", lease_owner=None)
+            self._remove_file(task.file_path)
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(task))
+        try:
+            handler = HANDLERS.get(task.kind)
+            if handler is None:
+                raise PermanentTaskError(f"Unknown task kind: {task.kind}")
+            file_content = None
+            if task.file_path:
+                try:
+                    with open(task.file_path, "rb") as f:
+                        file_content = f.read()
+                except OSError:
+                    raise PermanentTaskError("Uploaded file is no longer available")
+            async with async_session() as db:
+                result = await handler(db, json.loads(task.payload), file_content)
+            await self._update_owned(task, status="done", result=json.dumps(result, default=str), error=None, lease_owner=None)
+            self._remove_file(task.file_path)
+        except asyncio.CancelledError:
+            # Graceful shutdown: hand the task back without spending an attempt
+            await self._update_owned(task, status="pending", lease_owner=None, attempts=ScreeningTask.attempts - 1)
+            raise
+        except (PermanentTaskError, ResumeParseError) as e:
+            await self._update_owned(task, status="failed", error=str(e), lease_owner=None)
+            self._remove_file(task.file_path)
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            print(f"❌ Task {task.id} ({task.kind}) attempt {task.attempts} failed: {error}")
+            if task.attempts >= task.max_attempts:
+                await self._update_owned(task, status="failed", error=error, lease_owner=None)
+                self._remove_file(task.file_path)
+            else:
+                # Exponential backoff before the next attempt
+                retry_at = datetime.utcnow() + timedelta(seconds=5 * 2 ** (task.attempts - 1))
+                await self._update_owned(task, status="pending", error=error, available_at=retry_at, lease_owner=None)
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self):
+        while True:
+            try:
+                task = await self.claim()
+            except Exception as e:
+                print(f"⚠️ Task claim failed: {e}")
+                task = None
+            if task is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=TASK_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(task)
+            except Exception:
+                # The status write in _run's own error handling failed too; the lease expires and the
+                # task is claimed again, but this worker must keep going
+                print(f"❌ Task {task.id} worker error")
+                traceback.print_exc()
+
+    def start(self):
+        if not self._tasks and self.workers > 0:
+            self._wakeup = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def shutdown(self):
+        # Running tasks go back to pending; after a hard crash their leases expire instead
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+task_queue = TaskQueue()
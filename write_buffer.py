@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import upsert_resume_logs, upsert_resume_log, discard_unreferenced_blobs
+from database import async_session
+
+
+# Off by default: every screen commits its own row, as before
+WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED", "false").lower() == "true"
+# A flush happens when this many rows are waiting ...
+WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", "100"))
+# ... or this long after the first waiting row arrived
+WRITE_BUFFER_MAX_DELAY_MS = float(os.getenv("WRITE_BUFFER_MAX_DELAY_MS", "10"))
+
+
+def batch_waiters(waiters):
+    return [done for dones in waiters.values() for done in dones]
+
+
+class ResultWriteBuffer:
+    # Group commit for ResumeLog rows (with their ResumeFile entries, search index rows and job_stats changes): callers wait until the transaction holding their row has committed
+
+    def __init__(self, enabled=WRITE_BUFFER_ENABLED, max_rows=WRITE_BUFFER_MAX_ROWS, max_delay_ms=WRITE_BUFFER_MAX_DELAY_MS):
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self._queue = None
+        self._task = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+        self.max_batch_size = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._flusher())
+
+    async def shutdown(self):
+        # Flush whatever is still waiting, then stop the flusher
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def write(self, db: AsyncSession, values: dict, file_values: dict = None, search_values: dict = None):
+        if self._task is None:
+            # Disabled (or not started): write through on the caller's session
+            replaced_blobs = await upsert_resume_log(db, values, file_values, search_values)
+            await db.commit()
+            await discard_unreferenced_blobs(db, replaced_blobs)
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((values, file_values, search_values, done))
+        # Shielded so a cancelled caller does not cancel the shared flush; the row is still written
+        await asyncio.shield(done)
+
+    async def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            if item is None:
+                break
+        return batch
+
+    async def _flusher(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            batch = [first] if first is None else await self._collect(first)
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch):
+        # Last write wins for the same (job_id, email); Postgres rejects an upsert touching one row twice
+        rows, file_rows, search_rows, waiters = {}, {}, {}, {}
+        for values, file_values, search_values, done in batch:
+            key = (values.get("job_id"), values.get("email"))
+            rows[key] = values
+            if file_values is not None:
+                file_rows[key] = file_values
+            if search_values is not None:
+                search_rows[key] = search_values
+            waiters.setdefault(key, []).append(done)
+
+        started = time.perf_counter()
+        try:
+            await self._commit(list(rows.values()), list(file_rows.values()), list(search_rows.values()))
+        except Exception as e:
+            self.failed_flushes += 1
+            if len(rows) == 1:
+                print(f"❌ Write buffer flush of {len(batch)} rows failed: {e}")
+                self._resolve(batch_waiters(waiters), e)
+                return
+            # One bad row (e.g. a missing NOT NULL value) must not fail everyone else's screen:
+            # write the rows one by one so only the caller whose row is rejected gets the error
+            print(f"⚠️ Write buffer flush of {len(batch)} rows failed, retrying row by row: {e}")
+            for key, values in rows.items():
+                file_values, search_values = file_rows.get(key), search_rows.get(key)
+                try:
+                    await self._commit([values], [file_values] if file_values else None, [search_values] if search_values else None)
+                except Exception as row_error:
+                    print(f"❌ Write buffer row {key} failed: {row_error}")
+                    self._resolve(waiters[key], row_error)
+                else:
+                    self.rows_written += 1
+                    self._resolve(waiters[key])
+            return
+
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.rows_written += len(rows)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.last_flush_seconds = elapsed
+        self.total_flush_seconds += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self._resolve(batch_waiters(waiters))
+
+    async def _commit(self, rows, file_rows, search_rows):
+        async with async_session() as db:
+            replaced_blobs = await upsert_resume_logs(db, rows, file_rows, search_rows)
+            await db.commit()
+            await discard_unreferenced_blobs(db, replaced_blobs)
+
+    def _resolve(self, waiters, error=None):
+        for done in waiters:
+            if done.done():
+                continue
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+    def stats(self):
+        return {
+            "enabled": self._task is not None,
+            "max_rows": self.max_rows,
+            "max_delay_ms": self.max_delay * 1000,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rows_written": self.rows_written,
+            "avg_batch_size": round(self.rows_written / self.flushes, 2) if self.flushes else 0,
+            "max_batch_size": self.max_batch_size,
+            "avg_flush_ms": round(self.total_flush_seconds / self.flushes * 1000, 2) if self.flushes else 0,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+        }
+
+
+result_write_buffer = ResultWriteBuffer()